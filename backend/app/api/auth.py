@@ -3,18 +3,38 @@ Authentication API Routes
 Handles Google OAuth login, callback, and logout
 """
 
+import logging
+import traceback
+from types import SimpleNamespace
 from typing import Dict, Any
 from fastapi import APIRouter, Request, HTTPException, status
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, ORJSONResponse
 from pydantic import BaseModel
 
 from app.config.auth_config import get_auth_config, GoogleUser
-from app.middleware.auth_middleware import get_current_user, require_auth
+from app.middleware.auth_middleware import get_current_user, require_auth, verify_token
 
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
+def _resolve_auth_capabilities() -> SimpleNamespace:
+    """Resolve static auth configuration attributes once at import"""
+    auth_config = get_auth_config()
+    return SimpleNamespace(
+        oauth_enabled=getattr(auth_config, 'enabled', False),
+        has_client_id=bool(getattr(auth_config, 'google_client_id', None)),
+        has_client_secret=bool(getattr(auth_config, 'google_client_secret', None)),
+        redirect_uri=getattr(auth_config, 'google_redirect_uri', None),
+        config_type=type(auth_config).__name__
+    )
+
+
+# Auth config is a process-wide singleton that does not change after startup
+AUTH_CAPS = _resolve_auth_capabilities()
+
+
 class LoginRequest(BaseModel):
     """Request model for login with Google ID token"""
     id_token: str
@@ -36,29 +56,18 @@ async def google_login(request: Request):
     
     if not hasattr(auth_config, 'oauth') or not auth_config.enabled:
         # For development without OAuth configured
-        return JSONResponse({
+        return ORJSONResponse({
             "login_url": "/auth/dev-login",
             "message": "Development mode - use mock authentication"
         })
     
     try:
-        # Build Google OAuth URL manually for better error handling
-        google_auth_url = (
-            f"https://accounts.google.com/o/oauth2/auth?"
-            f"client_id={auth_config.google_client_id}&"
-            f"redirect_uri={auth_config.google_redirect_uri}&"
-            f"scope=openid email profile&"
-            f"response_type=code&"
-            f"access_type=offline"
-        )
-        
-        # Redirect directly to Google
-        from fastapi.responses import RedirectResponse
-        return RedirectResponse(url=google_auth_url)
+        # Redirect directly to Google (URL is precomputed at startup)
+        return RedirectResponse(url=auth_config.google_auth_url)
         
     except Exception as e:
-        print(f"Google OAuth login error: {e}")
-        return JSONResponse({
+        logger.error("Google OAuth login error: %s", e)
+        return ORJSONResponse({
             "error": "OAuth configuration error",
             "message": "Please check Google OAuth credentials"
         }, status_code=500)
@@ -84,9 +93,8 @@ async def google_callback(request: Request):
                 detail="Authorization code not found"
             )
         
-        # Exchange code for token using requests
-        import requests as requests_lib
-        
+        # Exchange code for token over the shared (HTTP/2) client
+        http_client = request.app.state.http
         token_url = "https://oauth2.googleapis.com/token"
         token_data = {
             'client_id': auth_config.google_client_id,
@@ -96,7 +104,7 @@ async def google_callback(request: Request):
             'redirect_uri': auth_config.google_redirect_uri,
         }
         
-        token_response = requests_lib.post(token_url, data=token_data)
+        token_response = await http_client.post(token_url, data=token_data)
         token_json = token_response.json()
         
         if 'access_token' not in token_json:
@@ -104,7 +112,7 @@ async def google_callback(request: Request):
         
         # Get user info from Google
         user_info_url = f"https://www.googleapis.com/oauth2/v2/userinfo?access_token={token_json['access_token']}"
-        user_response = requests_lib.get(user_info_url)
+        user_response = await http_client.get(user_info_url)
         user_info = user_response.json()
         
         # Create user object
@@ -120,15 +128,12 @@ async def google_callback(request: Request):
         jwt_token = auth_config.create_jwt_token(user)
         
         # Redirect to frontend with token
-        from fastapi.responses import RedirectResponse
         frontend_url = f"http://localhost:5174/?token={jwt_token}"
-        print(f"OAuth success! Redirecting to: {frontend_url[:50]}...")
+        logger.debug("OAuth success, redirecting to frontend")
         return RedirectResponse(url=frontend_url)
         
     except Exception as e:
-        print(f"OAuth callback error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("OAuth callback error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Authentication failed: {str(e)}"
@@ -166,7 +171,7 @@ async def login_with_id_token(login_request: LoginRequest):
         }
         
     except Exception as e:
-        print(f"ID token verification error: {e}")
+        logger.warning("ID token verification error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Authentication failed"
@@ -204,7 +209,7 @@ async def dev_login(user_id: str = "dev_user"):
 @router.post("/auth/logout")
 async def logout():
     """Logout user"""
-    response = JSONResponse({"message": "Logged out successfully"})
+    response = ORJSONResponse({"message": "Logged out successfully"})
     response.delete_cookie("access_token")
     return response
 
@@ -226,8 +231,6 @@ async def get_current_user_info(request: Request):
 @router.get("/auth/status")
 async def auth_status(request: Request):
     """Get authentication status"""
-    auth_config = get_auth_config()
-    
     # Check if authorization header is present
     auth_header = request.headers.get("Authorization")
     
@@ -238,7 +241,7 @@ async def auth_status(request: Request):
     # If middleware didn't authenticate, try manual verification
     if not user and auth_header and auth_header.startswith("Bearer "):
         token = auth_header.split(" ")[1]
-        user = auth_config.verify_jwt_token(token)
+        user = verify_token(token)
         authenticated = user is not None
     
     if user and authenticated:
@@ -250,27 +253,19 @@ async def auth_status(request: Request):
                 "name": user.name,
                 "picture": user.picture
             },
-            "oauth_enabled": auth_config.enabled if hasattr(auth_config, 'enabled') else False
+            "oauth_enabled": AUTH_CAPS.oauth_enabled
         }
     
     return {
         "authenticated": False,
         "user": None,
-        "oauth_enabled": auth_config.enabled if hasattr(auth_config, 'enabled') else False
+        "oauth_enabled": AUTH_CAPS.oauth_enabled
     }
 
 @router.get("/auth/config")
 async def auth_config_status():
     """Get OAuth configuration status for debugging"""
-    auth_config = get_auth_config()
-    
-    return {
-        "oauth_enabled": auth_config.enabled if hasattr(auth_config, 'enabled') else False,
-        "has_client_id": bool(getattr(auth_config, 'google_client_id', None)),
-        "has_client_secret": bool(getattr(auth_config, 'google_client_secret', None)),
-        "redirect_uri": getattr(auth_config, 'google_redirect_uri', None),
-        "config_type": type(auth_config).__name__
-    }
+    return dict(vars(AUTH_CAPS))
 
 @router.get("/auth/debug")
 async def debug_auth():
@@ -278,24 +273,13 @@ async def debug_auth():
     try:
         auth_config = get_auth_config()
         
-        # Test OAuth URL generation
-        google_auth_url = (
-            f"https://accounts.google.com/o/oauth2/auth?"
-            f"client_id={auth_config.google_client_id}&"
-            f"redirect_uri={auth_config.google_redirect_uri}&"
-            f"scope=openid email profile&"
-            f"response_type=code&"
-            f"access_type=offline"
-        )
-        
         return {
             "status": "success",
-            "oauth_url": google_auth_url,
-            "config_type": type(auth_config).__name__,
-            "enabled": getattr(auth_config, 'enabled', False)
+            "oauth_url": auth_config.google_auth_url,
+            "config_type": AUTH_CAPS.config_type,
+            "enabled": AUTH_CAPS.oauth_enabled
         }
     except Exception as e:
-        import traceback
         return {
             "status": "error", 
             "error": str(e),
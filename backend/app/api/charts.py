@@ -2,8 +2,10 @@
 Chart serving API endpoints.
 """
 
-from fastapi import APIRouter, HTTPException, Response
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import Optional, Tuple
+import aiofiles
 import os
 import logging
 from app.services.chart_executor import chart_executor
@@ -11,9 +13,49 @@ from app.services.chart_executor import chart_executor
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Chart filenames embed a fresh UUID, so a given URL never changes content
+CHART_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHART_CHUNK_SIZE = 64 * 1024
 
-@router.get("/charts/{chart_filename}")
-async def get_chart(chart_filename: str):
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=start-end`` range into inclusive offsets
+    
+    Returns None when the range is malformed or cannot be satisfied.
+    """
+    spec = range_header.partition("=")[2]
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if not start_text:
+            # Suffix range: the last N bytes
+            length = int(end_text)
+            if length <= 0:
+                return None
+            return max(size - length, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+async def _read_file_range(path: str, start: int, end: int):
+    """Yield the inclusive byte range of a file in chunks"""
+    async with aiofiles.open(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(CHART_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.api_route("/charts/{chart_filename}", methods=["GET", "HEAD"])
+async def get_chart(chart_filename: str, request: Request):
     """Serve a chart image file."""
     try:
         chart_path = chart_executor.get_chart_path(chart_filename)
@@ -21,12 +63,48 @@ async def get_chart(chart_filename: str):
         if not chart_path:
             raise HTTPException(status_code=404, detail="Chart not found")
         
+        try:
+            stat = os.stat(chart_path)
+        except FileNotFoundError:
+            chart_executor.forget_chart(chart_filename)
+            raise HTTPException(status_code=404, detail="Chart not found")
+        etag = f'W/"{int(stat.st_mtime)}-{stat.st_size}"'
+        headers = {"Cache-Control": CHART_CACHE_CONTROL, "ETag": etag, "Accept-Ranges": "bytes"}
+        
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(stat.st_size)
+            return Response(status_code=200, media_type="image/png", headers=headers)
+        
+        # Only single byte ranges are served partially; anything else gets the full file
+        range_header = request.headers.get("range", "")
+        if range_header.startswith("bytes=") and "," not in range_header:
+            byte_range = _parse_range(range_header, stat.st_size)
+            if byte_range is None:
+                headers["Content-Range"] = f"bytes */{stat.st_size}"
+                return Response(status_code=416, headers=headers)
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                _read_file_range(chart_path, start, end),
+                status_code=206,
+                media_type="image/png",
+                headers=headers
+            )
+        
         return FileResponse(
             chart_path,
             media_type="image/png",
-            filename=chart_filename
+            filename=chart_filename,
+            headers=headers,
+            stat_result=stat
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error serving chart {chart_filename}: {e}")
-        raise HTTPException(status_code=500, detail="Error serving chart")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Error serving chart")
@@ -1,14 +1,24 @@
-from fastapi import APIRouter, HTTPException, Request
-from app.models.chat import SendMessageRequest, SendMessageResponse, ChatHistoryResponse, MessageRole, UpdateSessionTitleRequest
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.models.chat import SendMessageRequest, SendMessageResponse, ChatHistoryResponse, MessageRole, UpdateSessionTitleRequest, ChatSession, Message
 from app.data_science.agent import root_agent as data_science_agent
+from app.data_science.tools import ToolContext
+from app.api.negotiation import negotiate, json_body, json_body_openapi
 import logging
 import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+import orjson
+from cachetools import TTLCache
 
 # Import the persistent session manager
-from app.core.persistent_session_manager import persistent_session_manager as session_manager
+from app.core.persistent_session_manager import persistent_session_manager as session_manager, PersistentSessionMemory
 
 # Import observability
-from app.config.observability import observability
+from app.config.observability import observability, OBSERVABILITY_ENABLED
 
 # Import authentication
 from app.middleware.auth_middleware import get_current_user, get_user_id
@@ -17,63 +27,64 @@ from app.database.models import db_manager
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/chat/send", response_model=SendMessageResponse)
-async def send_message(request: SendMessageRequest, http_request: Request):
-    """Send a message to the Data Science Multi-Agent System and get a response"""
-    try:
-        print("=== Chat send message endpoint called ===")
-        # Get authenticated user
-        user = get_current_user(http_request)
-        user_id = get_user_id(http_request)
-        
-        print(f"Chat: User from middleware: {user.email if user else 'None'}")
-        print(f"Chat: User ID: {user_id}")
-        
-        # Update or create user record if authenticated
-        if user:
-            print(f"Chat: Creating/updating user record for {user.email}")
-            try:
-                db_manager.create_or_update_user(
-                    user_id=user.id,
-                    email=user.email,
-                    name=user.name,
+# Users whose record was upserted recently, mapped to the profile that was written
+USER_UPSERT_TTL = 3600
+_upserted_users: TTLCache = TTLCache(maxsize=10000, ttl=USER_UPSERT_TTL)
+
+
+@dataclass
+class ChatTurn:
+    """State shared between the start and the end of one chat turn"""
+    session: ChatSession
+    session_id: str
+    context: ToolContext
+    memory: Optional[PersistentSessionMemory]
+    trace: Optional[str]
+    received_at: datetime
+    start_time: float
+
+
+async def _start_chat_turn(request: SendMessageRequest, http_request: Request) -> ChatTurn:
+    """Resolve the user and session and build the agent context for a message"""
+    received_at = datetime.now()
+    logger.debug("Chat send message endpoint called")
+    # Get authenticated user
+    user = get_current_user(http_request)
+    user_id = get_user_id(http_request)
+    
+    logger.debug("Chat: user from middleware: %s, user ID: %s", user.email if user else None, user_id)
+    
+    # Update or create user record if authenticated and not already upserted
+    # with this exact profile
+    profile = (user.email, user.name, user.picture, user.verified_email) if user else None
+    if user and _upserted_users.get(user.id) != profile:
+        logger.debug("Chat: creating/updating user record for %s", user.email)
+        try:
+            db_manager.create_or_update_user(
+                user_id=user.id,
+                email=user.email,
+                name=user.name,
                 picture=user.picture,
                 verified_email=user.verified_email
             )
-                print("Chat: User record created/updated successfully")
-            except Exception as e:
-                print(f"Chat: Error creating/updating user record: {e}")
-                import traceback
-                traceback.print_exc()
-        
-        # Create session if not provided
-        if not request.session_id:
-            session = session_manager.create_session(user_id=user_id)
-            session_id = session.id
-        else:
-            session_id = request.session_id
-            session = session_manager.get_session(session_id)
-            if not session:
-                # Create session with the requested ID
-                session = session_manager.create_session(session_id=session_id, user_id=user_id)
-            else:
-                # Verify session belongs to user (for security)
-                if hasattr(session, 'user_id') and session.user_id != user_id:
-                    raise HTTPException(status_code=403, detail="Access denied to this session")
-        
-        # Ensure we have a valid session
-        if not session:
-            raise HTTPException(status_code=500, detail="Failed to create or retrieve session")
-        
-        # Add user message
-        user_message = session_manager.add_message(
-            session_id=session_id,
-            content=request.message,
-            role=MessageRole.USER
-        )
-        
-        # Track user query
-        start_time = time.time()
+            _upserted_users[user.id] = profile
+            logger.debug("Chat: user record created/updated")
+        except Exception:
+            logger.exception("Chat: error creating/updating user record")
+    
+    # Load the requested session, creating it if it is new or not provided
+    session = session_manager.get_or_create_session(request.session_id, user_id=user_id)
+    session_id = session.id
+    
+    # Verify session belongs to user (for security); the owner was cached
+    # when the session was loaded
+    if session_manager.get_session_owner(session_id) != user_id:
+        raise HTTPException(status_code=403, detail="Access denied to this session")
+    
+    # Track user query; the event is recorded by the observability worker
+    start_time = time.time()
+    trace = None
+    if OBSERVABILITY_ENABLED:
         trace = observability.track_query(
             session_id=session_id,
             query=request.message,
@@ -82,31 +93,50 @@ async def send_message(request: SendMessageRequest, http_request: Request):
                 "session_created": session.created_at.isoformat() if session else None
             }
         )
-        
-        # Get response from Data Science Multi-Agent System
-        from app.data_science.tools import ToolContext
-        context = ToolContext()
-        context.update_state("session_id", session_id)
-        context.update_state("observability_trace", trace)  # Pass trace to agents
-        
-        # Get fresh session data including the new user message
-        fresh_session = session_manager.get_session(session_id)
-        if fresh_session:
-            context.update_state("message_history", [msg.content for msg in fresh_session.messages[-5:]])
-        
-        # Get memory from persistent session manager
-        memory = session_manager.get_session_memory(session_id)
-        if memory:
-            # Transfer memory state to ToolContext
-            for key, value in memory.state.items():
-                context.update_state(key, value)
-            context.history = memory.history
-        
-        ai_response = await data_science_agent.process_message(request.message, context)
-        
+    
+    # Get response from Data Science Multi-Agent System
+    context = ToolContext()
+    context.update_state("session_id", session_id)
+    
+    # Get memory from persistent session manager
+    memory = session_manager.get_session_memory(session_id)
+    
+    if memory:
+        # Transfer memory state to ToolContext
+        context.load_state(memory.state)
+        context.history = memory.history
+    
+    # Recent history including the new user message, which is persisted
+    # together with the AI reply once the agent has answered
+    if memory:
+        recent = deque(memory.recent_contents, maxlen=memory.recent_contents.maxlen)
+        recent.append(request.message)
+        context.update_state("message_history", list(recent))
+    else:
+        context.update_state("message_history", [msg.content for msg in session.messages[-4:]] + [request.message])
+    
+    context.update_state("observability_trace", trace)  # Pass trace to agents
+    
+    return ChatTurn(
+        session=session,
+        session_id=session_id,
+        context=context,
+        memory=memory,
+        trace=trace,
+        received_at=received_at,
+        start_time=start_time
+    )
+
+
+def _finish_chat_turn(turn: ChatTurn, user_content: str, ai_response: str) -> Message:
+    """Record metrics, save agent memory and persist the turn's messages"""
+    context = turn.context
+    
+    # Metrics are only gathered when the query is being traced
+    if turn.trace:
         # Calculate metrics
         end_time = time.time()
-        duration_ms = (end_time - start_time) * 1000
+        duration_ms = (end_time - turn.start_time) * 1000
         
         # Extract agent metrics from context
         agent_metrics = {
@@ -117,59 +147,137 @@ async def send_message(request: SendMessageRequest, http_request: Request):
             "charts_generated": context.get_state("charts_generated", 0)
         }
         
-        # Track response
-        observability.track_response(trace, ai_response, agent_metrics)
+        # Track response off the critical path
+        observability.track_response(turn.trace, ai_response, agent_metrics)
+    
+    # Save updated context back to persistent memory
+    if turn.memory:
+        turn.memory.history = context.history
+        turn.memory.bulk_update_state(context.state)
+    
+    # Persist user message and AI reply in one write
+    user_message, ai_message = session_manager.add_messages(turn.session_id, [
+        {"content": user_content, "role": MessageRole.USER, "timestamp": turn.received_at},
+        {"content": ai_response, "role": MessageRole.ASSISTANT}
+    ], session=turn.session)
+    
+    return ai_message
+
+
+# Chat requests are validated straight from the raw body bytes
+_send_message_body = json_body(SendMessageRequest)
+
+
+# Terminates every chat event stream
+_SSE_DONE = b"data: [DONE]\n\n"
+
+
+def _sse_event(payload: Any) -> bytes:
+    """Format one server-sent event"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+# Content events only vary in their text, so the rest of the frame is fixed
+_SSE_CONTENT_PREFIX = b'data: {"content":'
+_SSE_CONTENT_SUFFIX = b"}\n\n"
+
+
+def _sse_content_event(content: str) -> bytes:
+    """Format a ``{"content": ...}`` server-sent event"""
+    return _SSE_CONTENT_PREFIX + orjson.dumps(content) + _SSE_CONTENT_SUFFIX
+
+
+@router.post("/chat/send", response_model=SendMessageResponse, openapi_extra=json_body_openapi(SendMessageRequest))
+async def send_message(http_request: Request, request: SendMessageRequest = Depends(_send_message_body)):
+    """Send a message to the Data Science Multi-Agent System and get a response"""
+    turn = None
+    try:
+        turn = await _start_chat_turn(request, http_request)
         
-        # Save updated context back to persistent memory
-        if memory:
-            for key, value in context.state.items():
-                memory.update_state(key, value)
-            memory.history = context.history
+        ai_response = await data_science_agent.process_message(request.message, turn.context)
         
-        # Add AI message
-        ai_message = session_manager.add_message(
-            session_id=session_id,
-            content=ai_response,
-            role=MessageRole.ASSISTANT
-        )
+        ai_message = _finish_chat_turn(turn, request.message, ai_response)
         
-        return SendMessageResponse(
+        return negotiate(http_request, SendMessageResponse(
             message=ai_response,
-            session_id=session_id,
+            session_id=turn.session_id,
             message_id=ai_message.id
-        )
+        ))
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"=== CHAT ERROR ===")
-        print(f"Error in send_message: {e}")
-        import traceback
-        traceback.print_exc()
-        logger.error(f"Error in send_message: {e}")
+        logger.exception("Error in send_message: %s", e)
         # Track error if we have a trace
-        if 'trace' in locals() and trace:
-            observability.track_error(trace, str(e), type(e).__name__)
+        if turn and turn.trace:
+            observability.track_error(turn.trace, str(e), type(e).__name__)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/send/stream", openapi_extra=json_body_openapi(SendMessageRequest))
+async def send_message_stream(http_request: Request, request: SendMessageRequest = Depends(_send_message_body)):
+    """Send a message and stream the response back as server-sent events
+    
+    Emits ``{"content": ...}`` events as the agent produces output, then a
+    ``{"session_id": ..., "message_id": ...}`` event once the reply is
+    persisted, and finally ``[DONE]``.
+    """
+    try:
+        turn = await _start_chat_turn(request, http_request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in send_message_stream: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+    
+    async def event_stream():
+        chunks = []
+        # The latest content event is held back one step so the final one can
+        # share a single write with the completion event and terminator
+        pending = b""
+        try:
+            async for chunk in data_science_agent.process_message_stream(request.message, turn.context):
+                # Empty chunks carry nothing for the client, so send no frame
+                if not chunk:
+                    continue
+                chunks.append(chunk)
+                if pending:
+                    yield pending
+                pending = _sse_content_event(chunk)
+            
+            ai_message = _finish_chat_turn(turn, request.message, "".join(chunks))
+            yield pending + _sse_event({"session_id": turn.session_id, "message_id": ai_message.id}) + _SSE_DONE
+        except Exception as e:
+            logger.error("Error in send_message_stream: %s", e)
+            if turn.trace:
+                observability.track_error(turn.trace, str(e), type(e).__name__)
+            yield pending + _sse_event({"error": str(e)}) + _SSE_DONE
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 @router.get("/chat/history/{session_id}", response_model=ChatHistoryResponse)
-async def get_chat_history(session_id: str, http_request: Request):
-    """Get chat history for a session"""
+async def get_chat_history(session_id: str, http_request: Request,
+                           limit: Optional[int] = Query(None, ge=1),
+                           before_id: Optional[str] = None):
+    """Get chat history for a session, optionally only the newest ``limit`` messages sent before message ``before_id``"""
     try:
         # Get authenticated user
         user_id = get_user_id(http_request)
         
         # Verify session belongs to user
-        session = session_manager.get_session(session_id)
-        if not session:
+        owner_id = session_manager.get_session_owner(session_id)
+        if owner_id is None:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        if hasattr(session, 'user_id') and session.user_id != user_id:
+        if owner_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied to this session")
         
-        messages = session_manager.get_messages(session_id)
-        return ChatHistoryResponse(
+        messages = session_manager.get_messages(session_id, limit=limit, before_id=before_id)
+        return negotiate(http_request, ChatHistoryResponse(
             messages=messages,
             session_id=session_id
-        )
+        ))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting chat history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -182,11 +290,11 @@ async def delete_session(session_id: str, http_request: Request):
         user_id = get_user_id(http_request)
         
         # Verify session belongs to user
-        session = session_manager.get_session(session_id)
-        if not session:
+        owner_id = session_manager.get_session_owner(session_id)
+        if owner_id is None:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        if hasattr(session, 'user_id') and session.user_id != user_id:
+        if owner_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied to this session")
         
         success = session_manager.delete_session(session_id)
@@ -207,11 +315,11 @@ async def update_session_title(session_id: str, request: UpdateSessionTitleReque
         user_id = get_user_id(http_request)
         
         # Verify session belongs to user
-        session = session_manager.get_session(session_id)
-        if not session:
+        owner_id = session_manager.get_session_owner(session_id)
+        if owner_id is None:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        if hasattr(session, 'user_id') and session.user_id != user_id:
+        if owner_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied to this session")
         
         success = session_manager.update_session_title(session_id, request.title)
@@ -225,14 +333,15 @@ async def update_session_title(session_id: str, request: UpdateSessionTitleReque
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/chat/sessions")
-async def list_sessions(http_request: Request):
-    """List chat sessions for the authenticated user"""
+async def list_sessions(http_request: Request, limit: Optional[int] = Query(None, ge=1),
+                        offset: int = Query(0, ge=0)):
+    """List chat sessions for the authenticated user, optionally one page at a time"""
     try:
         # Get authenticated user
         user_id = get_user_id(http_request)
         
         # List only sessions for this user
-        sessions = db_manager.list_sessions(user_id=user_id)
+        sessions = db_manager.list_sessions(user_id=user_id, limit=limit, offset=offset)
         return {"sessions": sessions}
     except Exception as e:
         logger.error(f"Error listing sessions: {e}")
@@ -2,41 +2,66 @@
 Database management API endpoints
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from cachetools import TTLCache
 from app.database.models import db_manager
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Stats change slowly and are polled by the dashboard, so serve them from a
+# short-lived cache
+STATS_CACHE_TTL = 15
+_stats_cache: TTLCache = TTLCache(maxsize=1, ttl=STATS_CACHE_TTL)
+
+def _shape_stats(stats: dict, columnar: bool) -> dict:
+    """Return stats with recent sessions as a list of objects unless columnar is requested"""
+    if columnar:
+        return stats
+    recent = stats["recent_sessions"]
+    return {
+        **stats,
+        "recent_sessions": [dict(zip(recent["columns"], row)) for row in recent["rows"]]
+    }
+
 @router.get("/database/stats")
-async def get_database_stats():
+async def get_database_stats(columnar: bool = Query(False, description="Return recent sessions as columns and rows")):
     """Get database statistics"""
+    cached = _stats_cache.get("stats")
+    if cached is not None:
+        return _shape_stats(cached, columnar)
+    
     try:
         with db_manager.get_connection() as conn:
-            # Count sessions
-            session_count = conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
-            
-            # Count messages
-            message_count = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
-            
-            # Count sessions with memory
-            memory_count = conn.execute("SELECT COUNT(*) FROM session_memory").fetchone()[0]
+            # Count sessions, messages and sessions with memory in one query
+            session_count, message_count, memory_count = conn.execute("""
+                SELECT (SELECT COUNT(*) FROM chat_sessions),
+                       (SELECT COUNT(*) FROM messages),
+                       (SELECT COUNT(*) FROM session_memory)
+            """).fetchone()
             
-            # Get recent sessions
-            recent_sessions = conn.execute("""
+            # Get recent sessions, kept in columnar form until the response is shaped
+            recent_cursor = conn.execute("""
                 SELECT id, title, datetime(updated_at) as updated_at 
                 FROM chat_sessions 
                 ORDER BY updated_at DESC 
                 LIMIT 10
-            """).fetchall()
+            """)
+            recent_sessions = {
+                "columns": [column[0] for column in recent_cursor.description],
+                "rows": [tuple(row) for row in recent_cursor.fetchall()]
+            }
             
-            return {
+            stats = {
                 "session_count": session_count,
                 "message_count": message_count,
                 "memory_count": memory_count,
-                "recent_sessions": [dict(row) for row in recent_sessions]
+                "recent_sessions": recent_sessions
             }
+        _stats_cache["stats"] = stats
+        return _shape_stats(stats, columnar)
     except Exception as e:
         logger.error(f"Error getting database stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -46,6 +71,7 @@ async def cleanup_old_sessions(days_old: int = 30):
     """Clean up sessions older than specified days"""
     try:
         deleted_count = db_manager.cleanup_old_sessions(days_old)
+        _stats_cache.pop("stats", None)
         return {
             "message": f"Cleaned up {deleted_count} sessions older than {days_old} days",
             "deleted_count": deleted_count
@@ -58,22 +84,14 @@ async def cleanup_old_sessions(days_old: int = 30):
 async def get_full_session_data(session_id: str):
     """Get complete session data including messages and memory"""
     try:
-        # Get session
-        session = db_manager.get_session(session_id)
-        if not session:
+        # Load session, messages and memory on one connection, off the event loop
+        full_session = await asyncio.to_thread(db_manager.get_full_session, session_id)
+        if not full_session:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        # Get messages
-        messages = db_manager.get_messages(session_id)
-        
-        # Get memory
-        memory = db_manager.get_session_memory(session_id)
-        
         return {
-            "session": session,
-            "messages": messages,
-            "memory": memory,
-            "message_count": len(messages)
+            **full_session,
+            "message_count": len(full_session["messages"])
         }
     except HTTPException:
         raise
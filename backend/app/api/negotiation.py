@@ -0,0 +1,60 @@
+"""
+Content negotiation for chat payloads
+Clients that send "Accept: application/msgpack" get MessagePack bodies; JSON stays the default
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Type, TypeVar
+
+import msgpack
+from fastapi import Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Check whether the client asked for a MessagePack response"""
+    return MSGPACK_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def negotiate(request: Request, payload: Any) -> Any:
+    """Return a MessagePack response if requested, otherwise the payload unchanged"""
+    if not wants_msgpack(request):
+        return payload
+    if isinstance(payload, BaseModel):
+        payload = payload.model_dump(mode="json")
+    return Response(
+        content=msgpack.packb(payload, use_bin_type=True),
+        media_type=MSGPACK_MEDIA_TYPE,
+        headers={"Vary": "Accept"}
+    )
+
+
+def json_body(model: Type[ModelT]) -> Callable[[Request], Awaitable[ModelT]]:
+    """Dependency that validates the raw JSON request body as ``model``
+    
+    Pydantic parses the bytes directly, skipping the intermediate dict that
+    FastAPI's own body handling builds with ``json.loads``.
+    """
+    async def dependency(request: Request) -> ModelT:
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False))
+    
+    return dependency
+
+
+def json_body_openapi(model: Type[BaseModel]) -> Dict[str, Any]:
+    """OpenAPI request body for routes that read ``model`` with ``json_body``"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}}
+        }
+    }
@@ -0,0 +1,35 @@
+"""
+Precomputed JSON responses for endpoints with static payloads
+"""
+
+import hashlib
+from typing import Any
+
+import orjson
+from fastapi import Request, Response
+
+
+# Static payloads only change on deploy, so clients and proxies may reuse them briefly
+STATIC_CACHE_CONTROL = "public, max-age=300"
+
+
+class StaticJSONResponse:
+    """A JSON payload rendered once and served with a strong ETag"""
+
+    def __init__(self, payload: Any, cache_control: str = STATIC_CACHE_CONTROL):
+        self.body = orjson.dumps(payload)
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=16).hexdigest()}"'
+        self.headers = {"ETag": self.etag, "Cache-Control": cache_control}
+
+    def matches(self, if_none_match: str) -> bool:
+        """Check an If-None-Match header value against this payload's ETag"""
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+
+    def respond(self, request: Request) -> Response:
+        """Return 304 if the client already holds this payload, else the body"""
+        headers = dict(self.headers)
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self.matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
@@ -1,6 +1,9 @@
-from fastapi import APIRouter
-from typing import List, Dict, Any
+from fastapi import APIRouter, Request, Response
+from typing import Dict, List, Any, Tuple
 import random
+import re
+
+from app.api.static_responses import StaticJSONResponse
 
 router = APIRouter()
 
@@ -88,66 +91,63 @@ def get_comprehensive_question_categories() -> Dict[str, List[str]]:
         ]
     }
 
+# Specific names and codes mapped to generic placeholders
+_PII_REPLACEMENTS: Dict[str, str] = {
+    # Common names
+    "Rosalinda Rodriguez": "John Doe",
+    "rosalinda rodriguez": "john doe",
+    # Specific location codes
+    "location 061": "location ABC",
+    "location 075": "location XYZ",
+    # Specific activity codes
+    "DBOUTM": "ACTCODE",
+}
+_PII_PATTERN = re.compile("|".join(map(re.escape, _PII_REPLACEMENTS)))
+
 def mask_pii_in_question(question: str) -> str:
     """Mask personally identifiable information in questions."""
-    # Replace specific names and codes with generic placeholders
-    masked_question = question
-    
-    # Replace common names with generic ones
-    masked_question = masked_question.replace("Rosalinda Rodriguez", "John Doe")
-    masked_question = masked_question.replace("rosalinda rodriguez", "john doe")
-    
-    # Replace specific location codes
-    masked_question = masked_question.replace("location 061", "location ABC")
-    masked_question = masked_question.replace("location 075", "location XYZ")
-    
-    # Replace specific activity codes
-    masked_question = masked_question.replace("DBOUTM", "ACTCODE")
-    
-    return masked_question
+    return _PII_PATTERN.sub(lambda match: _PII_REPLACEMENTS[match.group(0)], question)
+
+def _normalize_category_name(name: str) -> str:
+    """Normalize a category name for case- and punctuation-insensitive lookup."""
+    return name.lower().replace(" ", "").replace("&", "")
+
+# Questions are static, so build and mask them once at import rather than per request
+_CATEGORIES: Dict[str, Tuple[str, ...]] = {
+    category: tuple(questions)
+    for category, questions in get_comprehensive_question_categories().items()
+}
+_MASKED_CATEGORIES: Dict[str, Tuple[str, ...]] = {
+    category: tuple(mask_pii_in_question(q) for q in questions)
+    for category, questions in _CATEGORIES.items()
+}
+_CATEGORY_KEYS: Tuple[str, ...] = tuple(_MASKED_CATEGORIES)
+# Question tuples of the non-empty categories, drawn from by index
+_CATEGORY_QUESTIONS: Tuple[Tuple[str, ...], ...] = tuple(
+    _MASKED_CATEGORIES[key] for key in _CATEGORY_KEYS if _MASKED_CATEGORIES[key]
+)
+_QUESTIONS_BY_NORMALIZED_CATEGORY: Dict[str, Tuple[str, ...]] = {
+    _normalize_category_name(name): questions for name, questions in _MASKED_CATEGORIES.items()
+}
+_CATEGORIES_RESPONSE = StaticJSONResponse(_MASKED_CATEGORIES)
 
 @router.get("/suggested-questions", response_model=List[str])
 async def get_suggested_questions():
     """Get 6 diverse questions covering different aspects of the TMS system."""
-    categories = get_comprehensive_question_categories()
-    
-    # Select one question from each of 6 different categories
-    selected_questions = []
-    category_names = list(categories.keys())
-    
     # Randomly select 6 categories (or all if less than 6)
-    num_categories = min(6, len(category_names))
-    selected_categories = random.sample(category_names, num_categories)
+    num_categories = min(6, len(_CATEGORY_QUESTIONS))
+    selected = random.sample(range(len(_CATEGORY_QUESTIONS)), num_categories)
     
-    for category in selected_categories:
-        questions = categories[category]
-        if questions:
-            question = random.choice(questions)
-            masked_question = mask_pii_in_question(question)
-            selected_questions.append(masked_question)
-    
-    return selected_questions
+    # Select one question from each selected category
+    return [random.choice(_CATEGORY_QUESTIONS[i]) for i in selected]
 
 @router.get("/suggested-questions/categories", response_model=Dict[str, List[str]])
-async def get_question_categories():
+async def get_question_categories(request: Request) -> Response:
     """Get all available question categories and their questions."""
-    categories = get_comprehensive_question_categories()
-    
-    # Mask PII in all questions
-    masked_categories = {}
-    for category, questions in categories.items():
-        masked_categories[category] = [mask_pii_in_question(q) for q in questions]
-    
-    return masked_categories
+    return _CATEGORIES_RESPONSE.respond(request)
 
 @router.get("/suggested-questions/category/{category_name}", response_model=List[str])
 async def get_questions_by_category(category_name: str):
     """Get questions for a specific category."""
-    categories = get_comprehensive_question_categories()
-    
     # Find category (case-insensitive)
-    for cat_name, questions in categories.items():
-        if cat_name.lower().replace(" ", "").replace("&", "") == category_name.lower().replace(" ", "").replace("&", ""):
-            return [mask_pii_in_question(q) for q in questions]
-    
-    return []
\ No newline at end of file
+    return list(_QUESTIONS_BY_NORMALIZED_CATEGORY.get(_normalize_category_name(category_name), ()))
@@ -14,17 +14,19 @@
 
 """API endpoints for BigQuery table information and query suggestions."""
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
+from functools import lru_cache
 from typing import Dict, Any, List
 import logging
 
+from app.api.static_responses import StaticJSONResponse
 from app.services.table_info_service import table_info_service
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.get("/table-info")
+@router.get("/table-info", response_model=None)
 async def get_table_info() -> Dict[str, Any]:
     """Get comprehensive BigQuery table information."""
     try:
@@ -43,7 +45,14 @@ async def get_table_info() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/table-info/suggestions")
+@router.post("/table-info/refresh")
+async def refresh_table_info() -> Dict[str, Any]:
+    """Drop cached table information so it is reloaded from BigQuery."""
+    table_info_service.invalidate_cache()
+    return {"success": True}
+
+
+@router.get("/table-info/suggestions", response_model=None)
 async def get_query_suggestions() -> Dict[str, Any]:
     """Get intelligent query suggestions based on table schemas."""
     try:
@@ -62,7 +71,7 @@ async def get_query_suggestions() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/table-info/schema")
+@router.get("/table-info/schema", response_model=None)
 async def get_schema_only() -> Dict[str, Any]:
     """Get only the schema information for all tables."""
     try:
@@ -75,16 +84,16 @@ async def get_schema_only() -> Dict[str, Any]:
         schema_info = {
             "database_info": table_info.get("database_info", {}),
             "schema_ddl": table_info.get("schema_ddl", ""),
-            "tables": {}
-        }
-        
-        for table_name, details in table_info.get("tables", {}).items():
-            schema_info["tables"][table_name] = {
-                "full_table_id": details.get("full_table_id"),
-                "schema": details.get("schema", []),
-                "description": details.get("description", ""),
-                "num_rows": details.get("num_rows", 0)
+            "tables": {
+                table_name: {
+                    "full_table_id": details.get("full_table_id"),
+                    "schema": details.get("schema", []),
+                    "description": details.get("description", ""),
+                    "num_rows": details.get("num_rows", 0)
+                }
+                for table_name, details in table_info.get("tables", {}).items()
             }
+        }
         
         return {
             "success": True,
@@ -96,7 +105,7 @@ async def get_schema_only() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/table-info/sample-queries")
+@router.get("/table-info/sample-queries", response_model=None)
 async def get_sample_queries() -> Dict[str, Any]:
     """Get sample queries categorized by type."""
     try:
@@ -139,7 +148,7 @@ async def get_sample_queries() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/table-info/table/{table_name}")
+@router.get("/table-info/table/{table_name}", response_model=None)
 async def get_specific_table_info(table_name: str) -> Dict[str, Any]:
     """Get detailed information about a specific table."""
     try:
@@ -168,50 +177,60 @@ async def get_specific_table_info(table_name: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@lru_cache(maxsize=None)
+def _query_examples_response() -> StaticJSONResponse:
+    """Render the categorized query examples once"""
+    from app.data_science.sub_agents.bigquery.prompts_config import get_query_examples
+    
+    query_examples = get_query_examples()
+    
+    # Count total queries
+    total_queries = sum(len(queries) for queries in query_examples.values())
+    
+    return StaticJSONResponse({
+        "success": True,
+        "data": {
+            "categories": list(query_examples.keys()),
+            "total_queries": total_queries,
+            "query_examples": query_examples
+        }
+    })
+
+
 @router.get("/table-info/query-examples")
-async def get_categorized_query_examples() -> Dict[str, Any]:
+async def get_categorized_query_examples(request: Request) -> Response:
     """Get query examples categorized by use case."""
     try:
-        from app.data_science.sub_agents.bigquery.prompts_config import get_query_examples
-        
-        query_examples = get_query_examples()
-        
-        # Count total queries
-        total_queries = sum(len(queries) for queries in query_examples.values())
-        
-        return {
-            "success": True,
-            "data": {
-                "categories": list(query_examples.keys()),
-                "total_queries": total_queries,
-                "query_examples": query_examples
-            }
-        }
+        return _query_examples_response().respond(request)
         
     except Exception as e:
         logger.error(f"Error getting query examples: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@lru_cache(maxsize=None)
+def _table_documentation_response() -> StaticJSONResponse:
+    """Render the full table documentation once"""
+    from app.data_science.sub_agents.bigquery.prompts_config import get_table_documentation
+    
+    return StaticJSONResponse({
+        "success": True,
+        "data": get_table_documentation()
+    })
+
+
 @router.get("/table-info/documentation")
-async def get_table_documentation() -> Dict[str, Any]:
+async def get_table_documentation(request: Request) -> Response:
     """Get comprehensive table and column documentation."""
     try:
-        from app.data_science.sub_agents.bigquery.prompts_config import get_table_documentation
-        
-        documentation = get_table_documentation()
-        
-        return {
-            "success": True,
-            "data": documentation
-        }
+        return _table_documentation_response().respond(request)
         
     except Exception as e:
         logger.error(f"Error getting table documentation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/table-info/documentation/{table_name}")
+@router.get("/table-info/documentation/{table_name}", response_model=None)
 async def get_specific_table_documentation(table_name: str) -> Dict[str, Any]:
     """Get detailed documentation for a specific table."""
     try:
@@ -234,19 +253,23 @@ async def get_specific_table_documentation(table_name: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@lru_cache(maxsize=None)
+def _sql_training_examples_response() -> StaticJSONResponse:
+    """Render the categorized SQL training examples once"""
+    from app.data_science.sub_agents.bigquery.prompts_config import get_sql_training_examples
+    
+    return StaticJSONResponse({
+        "success": True,
+        "data": get_sql_training_examples()
+    })
+
+
 @router.get("/table-info/sql-examples")
-async def get_sql_training_examples() -> Dict[str, Any]:
+async def get_sql_training_examples(request: Request) -> Response:
     """Get categorized SQL training examples for learning and reference."""
     try:
-        from app.data_science.sub_agents.bigquery.prompts_config import get_sql_training_examples
-        
-        examples = get_sql_training_examples()
-        
-        return {
-            "success": True,
-            "data": examples
-        }
+        return _sql_training_examples_response().respond(request)
         
     except Exception as e:
         logger.error(f"Error getting SQL training examples: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 from fastapi.responses import StreamingResponse
 import aiofiles
 import os
 import uuid
-from typing import Optional
-import pandas as pd
-import json
+import csv
+import hashlib
+import io
+from typing import Dict, Iterator, Optional
+import orjson
 from app.models.chat import FileUploadResponse
+from app.database.models import db_manager
+from app.core.persistent_session_manager import persistent_session_manager as session_manager
 from app.data_science.agent import root_agent as data_science_agent
+from app.middleware.auth_middleware import get_user_id
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,6 +23,7 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 ALLOWED_EXTENSIONS = {".csv", ".json", ".xlsx", ".txt", ".parquet"}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
 
 @router.post("/upload", response_model=FileUploadResponse)
 async def upload_file(file: UploadFile = File(...)):
@@ -34,31 +40,56 @@ async def upload_file(file: UploadFile = File(...)):
                 detail=f"File type {file_ext} not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
             )
         
-        # Check file size
-        contents = await file.read()
-        if len(contents) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="File too large")
-        
         # Generate unique filename
         file_id = str(uuid.uuid4())
         filename = f"{file_id}_{file.filename}"
         file_path = os.path.join(UPLOAD_DIR, filename)
         
-        # Save file
+        # Stream the file to disk, checking its size and hashing it as it arrives
+        file_size = 0
+        too_large = False
+        file_hash = hashlib.blake2b(digest_size=32)
         async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(contents)
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    too_large = True
+                    break
+                file_hash.update(chunk)
+                await f.write(chunk)
+        
+        if too_large:
+            os.remove(file_path)
+            raise HTTPException(status_code=400, detail="File too large")
+        
+        # Identical content was already uploaded and analyzed; reuse it
+        content_hash = file_hash.hexdigest()
+        existing = db_manager.get_uploaded_file_by_hash(content_hash)
+        if existing and os.path.exists(existing['path']):
+            os.remove(file_path)
+            logger.info(f"Duplicate upload of {existing['file_id']}: {file.filename}")
+            return FileUploadResponse(
+                file_id=existing['file_id'],
+                filename=file.filename,
+                size=file_size,
+                status="completed",
+                message="File already uploaded and processed"
+            )
+        
+        db_manager.add_uploaded_file(file_id, file.filename, file_size, file_path, content_hash)
         
         # Process file with Data Science Multi-Agent System
         # Create analysis context for the uploaded file
         file_context = {
             "file_id": file_id,
             "original_filename": file.filename,
-            "file_size": len(contents),
+            "file_size": file_size,
+            "file_path": file_path,
             "file_type": file_ext
         }
         
         # Generate analysis prompt for the data science agents
-        analysis_prompt = f"""I've uploaded a {file_ext} file named '{file.filename}' ({len(contents)} bytes). 
+        analysis_prompt = f"""I've uploaded a {file_ext} file named '{file.filename}' ({file_size} bytes). 
         Please analyze this dataset and provide comprehensive insights including:
         1. Data structure and quality assessment
         2. Key statistics and patterns
@@ -73,7 +104,7 @@ async def upload_file(file: UploadFile = File(...)):
         return FileUploadResponse(
             file_id=file_id,
             filename=file.filename,
-            size=len(contents),
+            size=file_size,
             status="completed",
             message="File uploaded and processed successfully"
         )
@@ -88,20 +119,21 @@ async def upload_file(file: UploadFile = File(...)):
 async def get_file_info(file_id: str):
     """Get information about an uploaded file"""
     try:
-        # Find file in upload directory
-        for filename in os.listdir(UPLOAD_DIR):
-            if filename.startswith(file_id):
-                file_path = os.path.join(UPLOAD_DIR, filename)
-                file_size = os.path.getsize(file_path)
-                
-                return {
-                    "file_id": file_id,
-                    "filename": filename.split("_", 1)[1],  # Remove UUID prefix
-                    "size": file_size,
-                    "path": file_path
-                }
-        
-        raise HTTPException(status_code=404, detail="File not found")
+        uploaded = db_manager.get_uploaded_file(file_id)
+        if not uploaded:
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        # Drop records whose file has been removed from disk
+        if not os.path.exists(uploaded['path']):
+            db_manager.delete_uploaded_file(file_id)
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        return {
+            "file_id": file_id,
+            "filename": uploaded['filename'],
+            "size": uploaded['size'],
+            "path": uploaded['path']
+        }
         
     except HTTPException:
         raise
@@ -109,56 +141,70 @@ async def get_file_info(file_id: str):
         logger.error(f"Error getting file info: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _export_row(msg) -> Dict[str, str]:
+    """Exported fields of a message"""
+    return {
+        "role": msg.role.value,
+        "content": msg.content,
+        "timestamp": msg.timestamp.isoformat()
+    }
+
+def _export_json(messages) -> Iterator[bytes]:
+    """Yield a JSON array of messages one element at a time"""
+    yield b"["
+    for i, msg in enumerate(messages):
+        yield (b",\n" if i else b"\n") + orjson.dumps(_export_row(msg))
+    yield b"\n]"
+
+def _export_csv(messages) -> Iterator[str]:
+    """Yield CSV rows of messages, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(("role", "content", "timestamp"))
+    for msg in messages:
+        writer.writerow((msg.role.value, msg.content, msg.timestamp.isoformat()))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _export_txt(messages) -> Iterator[str]:
+    """Yield one formatted line per message"""
+    for i, msg in enumerate(messages):
+        line = f"[{msg.timestamp.strftime('%Y-%m-%d %H:%M:%S')}] {msg.role.value.upper()}: {msg.content}\n"
+        yield ("\n" if i else "") + line
+
 @router.get("/export/{session_id}")
-async def export_chat(session_id: str, format: str = "json"):
+async def export_chat(session_id: str, http_request: Request, format: str = "json"):
     """Export chat history in various formats"""
     try:
-        from app.core.session_manager import session_manager
+        # Verify session belongs to user
+        owner_id = session_manager.get_session_owner(session_id)
+        if owner_id is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        if owner_id != get_user_id(http_request):
+            raise HTTPException(status_code=403, detail="Access denied to this session")
         
         messages = session_manager.get_messages(session_id)
         
         if format.lower() == "json":
-            data = json.dumps([
-                {
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp.isoformat()
-                }
-                for msg in messages
-            ], indent=2)
-            
             return StreamingResponse(
-                iter([data]),
+                _export_json(messages),
                 media_type="application/json",
                 headers={"Content-Disposition": f"attachment; filename=chat_{session_id}.json"}
             )
         
         elif format.lower() == "csv":
-            df = pd.DataFrame([
-                {
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp.isoformat()
-                }
-                for msg in messages
-            ])
-            
-            csv_data = df.to_csv(index=False)
-            
             return StreamingResponse(
-                iter([csv_data]),
+                _export_csv(messages),
                 media_type="text/csv",
                 headers={"Content-Disposition": f"attachment; filename=chat_{session_id}.csv"}
             )
         
         elif format.lower() == "txt":
-            text_data = "\n".join([
-                f"[{msg.timestamp.strftime('%Y-%m-%d %H:%M:%S')}] {msg.role.upper()}: {msg.content}\n"
-                for msg in messages
-            ])
-            
             return StreamingResponse(
-                iter([text_data]),
+                _export_txt(messages),
                 media_type="text/plain",
                 headers={"Content-Disposition": f"attachment; filename=chat_{session_id}.txt"}
             )
@@ -5,19 +5,27 @@ Handles Google OAuth2 setup and JWT token management for user authentication
 
 import os
 import json
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+import time
+import base64
+import hashlib
+import hmac
+from urllib.parse import urlencode
+from typing import Optional, Dict, Any, Tuple
 from dataclasses import dataclass
+from functools import lru_cache
 
 import jwt
-from google.oauth2 import id_token
-from google.auth.transport import requests
-from authlib.integrations.starlette_client import OAuth
+import orjson
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def _base64url(data: bytes) -> bytes:
+    """Unpadded base64url encoding, as used in JWT segments"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
 @dataclass
 class GoogleUser:
     """Represents an authenticated Google user"""
@@ -37,21 +45,46 @@ class AuthConfig:
         self.google_client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
         self.google_redirect_uri = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:8000/auth/google/callback")
         
+        # Authorization URL is static for the process lifetime, so build it once
+        self.google_auth_url = self._build_google_auth_url()
+        
         # JWT Configuration
         self.jwt_secret_key = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
         self.jwt_algorithm = "HS256"
         self.jwt_expiration_hours = int(os.getenv("JWT_EXPIRATION_HOURS", "24"))
+        self._jwt_expiration_seconds = self.jwt_expiration_hours * 3600
+        # Identifies the signing key, so caches of verified tokens can be keyed by it
+        self.jwt_key_version = hashlib.sha256(self.jwt_secret_key.encode()).hexdigest()[:8]
+        # The header and signing key never change, so encode the header and
+        # key the HMAC once; minting a token only encodes and signs the payload
+        self._jwt_header_segment = _base64url(orjson.dumps({"alg": self.jwt_algorithm, "typ": "JWT"}))
+        self._jwt_signer = hmac.new(self.jwt_secret_key.encode(), digestmod=hashlib.sha256)
         
         # OAuth Setup
-        self.oauth = OAuth()
+        self.oauth = None
         self._setup_google_oauth()
         
         # Validate configuration
         self._validate_config()
     
+    def _build_google_auth_url(self) -> str:
+        """Build the Google OAuth authorization URL"""
+        params = urlencode({
+            "client_id": self.google_client_id or "",
+            "redirect_uri": self.google_redirect_uri,
+            "scope": "openid email profile",
+            "response_type": "code",
+            "access_type": "offline",
+        })
+        return f"https://accounts.google.com/o/oauth2/auth?{params}"
+    
     def _setup_google_oauth(self):
         """Setup Google OAuth client"""
         if self.google_client_id and self.google_client_secret:
+            # authlib is only needed once Google OAuth is configured
+            from authlib.integrations.starlette_client import OAuth
+            
+            self.oauth = OAuth()
             self.oauth.register(
                 name='google',
                 client_id=self.google_client_id,
@@ -83,41 +116,54 @@ class AuthConfig:
     
     def create_jwt_token(self, user: GoogleUser) -> str:
         """Create a JWT token for an authenticated user"""
+        now = int(time.time())
         payload = {
             "user_id": user.id,
             "email": user.email,
             "name": user.name,
             "picture": user.picture,
             "verified_email": user.verified_email,
-            "exp": datetime.utcnow() + timedelta(hours=self.jwt_expiration_hours),
-            "iat": datetime.utcnow(),
+            "exp": now + self._jwt_expiration_seconds,
+            "iat": now,
             "iss": "tms-chatbot"
         }
         
-        return jwt.encode(payload, self.jwt_secret_key, algorithm=self.jwt_algorithm)
+        signing_input = self._jwt_header_segment + b"." + _base64url(orjson.dumps(payload))
+        signer = self._jwt_signer.copy()
+        signer.update(signing_input)
+        return (signing_input + b"." + _base64url(signer.digest())).decode()
     
     def verify_jwt_token(self, token: str) -> Optional[GoogleUser]:
         """Verify and decode a JWT token"""
+        return self.verify_jwt_token_with_expiry(token)[0]
+    
+    def verify_jwt_token_with_expiry(self, token: str) -> Tuple[Optional[GoogleUser], Optional[float]]:
+        """Verify and decode a JWT token, also returning its expiry timestamp"""
         try:
             payload = jwt.decode(token, self.jwt_secret_key, algorithms=[self.jwt_algorithm])
             
-            return GoogleUser(
+            user = GoogleUser(
                 id=payload.get("user_id"),
                 email=payload.get("email"),
                 name=payload.get("name"),
                 picture=payload.get("picture"),
                 verified_email=payload.get("verified_email", False)
             )
+            expires_at = float(payload["exp"]) if "exp" in payload else None
+            return user, expires_at
         
         except jwt.ExpiredSignatureError:
-            return None
+            return None, None
         except jwt.InvalidTokenError:
-            return None
+            return None, None
         except Exception:
-            return None
+            return None, None
     
     def verify_google_token(self, id_token_str: str) -> Optional[GoogleUser]:
         """Verify Google ID token and extract user information"""
+        from google.oauth2 import id_token
+        from google.auth.transport import requests
+        
         try:
             # Verify the token
             id_info = id_token.verify_oauth2_token(
@@ -178,14 +224,17 @@ class MockAuthConfig:
         )
 
 
-# Global auth configuration instance
-auth_config = AuthConfig()
-
-# Use mock auth if Google OAuth is not configured
-if not auth_config.enabled:
-    auth_config = MockAuthConfig()
+@lru_cache(maxsize=1)
+def get_auth_config() -> AuthConfig:
+    """Get the global authentication configuration (built once per process)"""
+    config = AuthConfig()
+    
+    # Use mock auth if Google OAuth is not configured
+    if not config.enabled:
+        config = MockAuthConfig()
+    
+    return config
 
 
-def get_auth_config() -> AuthConfig:
-    """Get the global authentication configuration"""
-    return auth_config
\ No newline at end of file
+# Global auth configuration instance
+auth_config = get_auth_config()
\ No newline at end of file
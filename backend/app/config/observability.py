@@ -2,23 +2,20 @@
 Observability configuration for tracking user queries and system performance
 """
 
+import asyncio
 import os
+import re
+import threading
+import time
+import uuid
 from typing import Optional, Dict, Any
 from functools import wraps
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
+from cachetools import TTLCache
 
 logger = logging.getLogger(__name__)
 
-# Try to import Langfuse, make it optional
-try:
-    from langfuse import Langfuse
-    LANGFUSE_AVAILABLE = True
-except ImportError:
-    print("⚠️ Langfuse not available - observability disabled")
-    LANGFUSE_AVAILABLE = False
-    Langfuse = None
-
 # Langfuse configuration
 LANGFUSE_ENABLED = os.getenv("LANGFUSE_ENABLED", "true").lower() == "true"
 LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY", "")
@@ -30,14 +27,55 @@ TRACK_USER_QUERIES = os.getenv("TRACK_USER_QUERIES", "true").lower() == "true"
 ANONYMIZE_USER_DATA = os.getenv("ANONYMIZE_USER_DATA", "false").lower() == "true"
 EXCLUDE_PATTERNS = os.getenv("EXCLUDE_TRACKING_PATTERNS", "").split(",") if os.getenv("EXCLUDE_TRACKING_PATTERNS") else []
 
+# Patterns removed from queries when anonymizing
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+PHONE_PATTERN = re.compile(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b')
+ID_PATTERN = re.compile(r'\b\d{5,}\b')
+
+# Keyword checks run as a single pass over the text
+SQL_QUERY_PATTERN = re.compile(r'select|from', re.IGNORECASE)
+SQL_RESPONSE_PATTERN = re.compile(r'select|from|where', re.IGNORECASE)
+CHART_KEYWORD_PATTERN = re.compile(r'chart|graph|plot|visuali', re.IGNORECASE)
+ERROR_KEYWORD_PATTERN = re.compile(r'error|failed', re.IGNORECASE)
+EXCLUDE_PATTERN = re.compile('|'.join(re.escape(p) for p in EXCLUDE_PATTERNS if p), re.IGNORECASE) if any(EXCLUDE_PATTERNS) else None
+
+# Background tracking worker
+TRACKING_QUEUE_SIZE = 10000
+TRACKING_BATCH_SIZE = 64
+TRACKING_FLUSH_INTERVAL = 5  # seconds
+TRACE_CACHE_SIZE = 1000
+TRACE_CACHE_TTL = 3600  # keep trace clients for follow-up events on a query
+
+# Shared read-only default for responses tracked without agent metrics
+NO_AGENT_METRICS: Dict[str, Any] = {}
+
+def _import_langfuse():
+    """Import the Langfuse client class, or return None if it is not installed"""
+    try:
+        from langfuse import Langfuse
+    except ImportError:
+        logger.warning("Langfuse not available - observability disabled")
+        return None
+    return Langfuse
+
 class ObservabilityManager:
     """Manages observability and tracking for the TMS chatbot"""
     
+    __slots__ = ("langfuse_client", "enabled", "_queue", "_worker", "_traces", "_traces_lock")
+    
     def __init__(self):
         self.langfuse_client = None
-        self.enabled = LANGFUSE_ENABLED and LANGFUSE_AVAILABLE
+        # Tracking events are recorded by a background worker, off the request path
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._traces: TTLCache = TTLCache(maxsize=TRACE_CACHE_SIZE, ttl=TRACE_CACHE_TTL)
+        # Traces are looked up from worker and agent pool threads alike
+        self._traces_lock = threading.Lock()
+        # Langfuse is optional and only imported when tracking is enabled
+        Langfuse = _import_langfuse() if LANGFUSE_ENABLED else None
+        self.enabled = Langfuse is not None
         
-        if self.enabled and LANGFUSE_AVAILABLE:
+        if self.enabled:
             try:
                 self.langfuse_client = Langfuse(
                     public_key=LANGFUSE_PUBLIC_KEY or None,
@@ -53,32 +91,139 @@ class ObservabilityManager:
         else:
             logger.info("⚠️ Observability disabled (Langfuse not available or disabled)")
     
-    def track_query(self, session_id: str, query: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[Any]:
-        """Track a user query"""
+    def track_query(self, session_id: str, query: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Track a user query, returning the id of its trace"""
         if not self.enabled or not TRACK_USER_QUERIES:
             return None
         
         # Check if query should be excluded
-        for pattern in EXCLUDE_PATTERNS:
-            if pattern and pattern in query.lower():
-                logger.debug(f"Skipping tracking for query matching excluded pattern: {pattern}")
-                return None
+        excluded = EXCLUDE_PATTERN.search(query) if EXCLUDE_PATTERN else None
+        if excluded:
+            logger.debug(f"Skipping tracking for query matching excluded pattern: {excluded.group(0)}")
+            return None
+        
+        trace_id = str(uuid.uuid4())
+        self._enqueue(self._record_query, trace_id, session_id, query, metadata, datetime.now(timezone.utc))
+        return trace_id
+    
+    def track_response(self, trace: Optional[str], response: str, agent_metrics: Optional[Dict[str, Any]] = None):
+        """Track the response to a query"""
+        if not self.enabled or not trace:
+            return
+        self._enqueue(self._record_response, trace, response, agent_metrics)
+    
+    def track_agent_call(self, trace: Optional[str], agent_name: str, input_data: str, output_data: str, duration_ms: float):
+        """Track individual agent calls"""
+        if not self.enabled or not trace:
+            return
+        self._enqueue(self._record_agent_call, trace, agent_name, input_data, output_data, duration_ms)
+    
+    def track_error(self, trace: Optional[str], error: str, error_type: str = "unknown"):
+        """Track errors in query processing"""
+        if not self.enabled or not trace:
+            return
+        self._enqueue(self._record_error, trace, error, error_type)
+    
+    def flush(self):
+        """Flush any pending tracking data"""
+        if self.enabled and self.langfuse_client:
+            try:
+                self.langfuse_client.flush()
+            except Exception as e:
+                logger.error(f"Error flushing observability data: {e}")
+    
+    async def shutdown(self):
+        """Record anything still queued, stop the tracking worker and flush"""
+        if self._worker and not self._worker.done():
+            await self._queue.put(None)  # stop marker, queued behind pending events
+            await self._worker
+        self._worker = None
+        self.flush()
+    
+    def _enqueue(self, record, *args):
+        """Hand a tracking event to the background worker without waiting on it"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop in this thread, so record the event inline
+            record(*args)
+            return
+        
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=TRACKING_QUEUE_SIZE)
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._drain_loop())
         
+        try:
+            self._queue.put_nowait((record, args))
+        except asyncio.QueueFull:
+            logger.warning("Observability queue full, dropping tracking event")
+    
+    async def _drain_loop(self):
+        """Record queued tracking events in batches and flush them periodically"""
+        last_flush = time.monotonic()
+        unflushed = False
+        while True:
+            batch = []
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), TRACKING_FLUSH_INTERVAL))
+            except asyncio.TimeoutError:
+                pass
+            while batch and len(batch) < TRACKING_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            stopping = None in batch
+            if stopping:
+                batch = batch[:batch.index(None)]
+            
+            if batch:
+                await asyncio.to_thread(self._record_batch, batch)
+                unflushed = True
+            
+            if stopping:
+                return
+            
+            if unflushed and time.monotonic() - last_flush >= TRACKING_FLUSH_INTERVAL:
+                await asyncio.to_thread(self.flush)
+                last_flush = time.monotonic()
+                unflushed = False
+    
+    def _record_batch(self, batch):
+        """Send a batch of queued tracking events to Langfuse"""
+        for record, args in batch:
+            record(*args)
+    
+    def _trace(self, trace_id: str) -> Any:
+        """Langfuse trace client for a trace id"""
+        with self._traces_lock:
+            trace = self._traces.get(trace_id)
+        if trace is None:
+            trace = self.langfuse_client.trace(id=trace_id)
+            with self._traces_lock:
+                trace = self._traces.setdefault(trace_id, trace)
+        return trace
+    
+    def _record_query(self, trace_id: str, session_id: str, query: str, metadata: Optional[Dict[str, Any]], timestamp: datetime):
+        """Create the trace for a user query"""
         try:
             # Anonymize if configured
             tracked_query = self._anonymize_query(query) if ANONYMIZE_USER_DATA else query
             
+            # Caller metadata is merged in place rather than spread into a new dict
+            trace_metadata = {"query_length": len(query), "timestamp": timestamp.isoformat()}
+            if metadata:
+                trace_metadata.update(metadata)
+            
             # Create trace for the query
             trace = self.langfuse_client.trace(
+                id=trace_id,
                 name="user_query",
                 user_id=session_id if not ANONYMIZE_USER_DATA else None,
                 session_id=session_id,
-                metadata={
-                    "query_length": len(query),
-                    "timestamp": datetime.utcnow().isoformat(),
-                    **(metadata or {})
-                }
+                metadata=trace_metadata
             )
+            with self._traces_lock:
+                self._traces[trace_id] = trace
             
             # Create span for query processing
             trace.span(
@@ -86,44 +231,41 @@ class ObservabilityManager:
                 input=tracked_query,
                 metadata={
                     "original_length": len(query),
-                    "contains_sql": "select" in query.lower() or "from" in query.lower(),
-                    "is_chart_request": any(word in query.lower() for word in ["chart", "graph", "plot", "visuali"])
+                    "contains_sql": SQL_QUERY_PATTERN.search(query) is not None,
+                    "is_chart_request": CHART_KEYWORD_PATTERN.search(query) is not None
                 }
             )
-            
-            return trace
         except Exception as e:
             logger.error(f"Error tracking query: {e}")
-            return None
     
-    def track_response(self, trace: Any, response: str, agent_metrics: Optional[Dict[str, Any]] = None):
-        """Track the response to a query"""
-        if not self.enabled or not trace:
-            return
-        
+    def _record_response(self, trace_id: str, response: str, agent_metrics: Optional[Dict[str, Any]]):
+        """Add the response span and final status to a trace"""
         try:
+            trace = self._trace(trace_id)
+            tracked_response = response[:1000] if ANONYMIZE_USER_DATA else response  # Limit size if anonymizing
+            metrics = agent_metrics or NO_AGENT_METRICS
             trace.span(
                 name="response_generated",
-                output=response[:1000] if ANONYMIZE_USER_DATA else response,  # Limit size if anonymizing
+                output=tracked_response,
                 metadata={
                     "response_length": len(response),
-                    "agents_used": agent_metrics.get("agents_used", []) if agent_metrics else [],
-                    "total_duration_ms": agent_metrics.get("duration_ms", 0) if agent_metrics else 0,
+                    "agents_used": metrics.get("agents_used", ()),
+                    "total_duration_ms": metrics.get("duration_ms", 0),
                     "has_chart": "/api/charts/" in response,
-                    "has_error": "error" in response.lower() or "failed" in response.lower()
+                    "has_error": ERROR_KEYWORD_PATTERN.search(response) is not None
                 }
             )
             
             # Track costs if available
-            if agent_metrics and "token_usage" in agent_metrics:
+            if "token_usage" in metrics:
                 trace.score(
                     name="token_usage",
-                    value=agent_metrics["token_usage"]
+                    value=metrics["token_usage"]
                 )
             
             # Update trace status
             trace.update(
-                output=response[:1000] if ANONYMIZE_USER_DATA else response,
+                output=tracked_response,
                 metadata={
                     "success": True,
                     "response_type": self._classify_response(response)
@@ -132,13 +274,10 @@ class ObservabilityManager:
         except Exception as e:
             logger.error(f"Error tracking response: {e}")
     
-    def track_agent_call(self, trace: Any, agent_name: str, input_data: str, output_data: str, duration_ms: float):
-        """Track individual agent calls"""
-        if not self.enabled or not trace:
-            return
-        
+    def _record_agent_call(self, trace_id: str, agent_name: str, input_data: str, output_data: str, duration_ms: float):
+        """Add an agent call span to a trace"""
         try:
-            trace.span(
+            self._trace(trace_id).span(
                 name=f"agent_{agent_name}",
                 input=input_data[:500] if ANONYMIZE_USER_DATA else input_data,
                 output=output_data[:500] if ANONYMIZE_USER_DATA else output_data,
@@ -151,12 +290,10 @@ class ObservabilityManager:
         except Exception as e:
             logger.error(f"Error tracking agent call: {e}")
     
-    def track_error(self, trace: Any, error: str, error_type: str = "unknown"):
-        """Track errors in query processing"""
-        if not self.enabled or not trace:
-            return
-        
+    def _record_error(self, trace_id: str, error: str, error_type: str):
+        """Score a trace as failed"""
         try:
+            trace = self._trace(trace_id)
             trace.score(
                 name="error",
                 value=1,
@@ -173,41 +310,29 @@ class ObservabilityManager:
         except Exception as e:
             logger.error(f"Error tracking error: {e}")
     
-    def flush(self):
-        """Flush any pending tracking data"""
-        if self.enabled and self.langfuse_client:
-            try:
-                self.langfuse_client.flush()
-            except Exception as e:
-                logger.error(f"Error flushing observability data: {e}")
-    
     def _anonymize_query(self, query: str) -> str:
         """Basic anonymization of queries"""
         # This is a simple implementation - enhance based on requirements
-        import re
-        
         # Remove email addresses
-        query = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[EMAIL]', query)
+        query = EMAIL_PATTERN.sub('[EMAIL]', query)
         
         # Remove phone numbers (basic pattern)
-        query = re.sub(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b', '[PHONE]', query)
+        query = PHONE_PATTERN.sub('[PHONE]', query)
         
         # Remove numbers that might be IDs
-        query = re.sub(r'\b\d{5,}\b', '[ID]', query)
+        query = ID_PATTERN.sub('[ID]', query)
         
         return query
     
     def _classify_response(self, response: str) -> str:
         """Classify the type of response"""
-        response_lower = response.lower()
-        
         if "/api/charts/" in response:
             return "chart"
         elif "```python" in response:
             return "code"
-        elif "error" in response_lower or "failed" in response_lower:
+        elif ERROR_KEYWORD_PATTERN.search(response):
             return "error"
-        elif any(word in response_lower for word in ["select", "from", "where"]):
+        elif SQL_RESPONSE_PATTERN.search(response):
             return "sql"
         elif len(response) > 500:
             return "detailed_analysis"
@@ -217,33 +342,39 @@ class ObservabilityManager:
 # Global observability manager instance
 observability = ObservabilityManager()
 
+# Checked by callers before building tracking payloads
+OBSERVABILITY_ENABLED = observability.enabled
+
 # Decorator for tracking functions
 def track_operation(operation_name: str):
     """Decorator to track function execution"""
+    span_name = f"{operation_name}_execution"
+    
     def decorator(func):
-        @wraps(func)
-        async def async_wrapper(*args, **kwargs):
-            if not observability.enabled:
-                return await func(*args, **kwargs)
-            
-            trace = observability.langfuse_client.trace(name=operation_name)
-            span = trace.span(name=f"{operation_name}_execution")
+        # Tracking is fixed at startup, so untracked functions are left unwrapped
+        if not OBSERVABILITY_ENABLED:
+            return func
+        
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                trace = observability.langfuse_client.trace(name=operation_name)
+                span = trace.span(name=span_name)
+                
+                try:
+                    result = await func(*args, **kwargs)
+                    span.end(output=str(result)[:500])
+                    return result
+                except Exception as e:
+                    span.end(level="error", status_message=str(e))
+                    raise
             
-            try:
-                result = await func(*args, **kwargs)
-                span.end(output=str(result)[:500])
-                return result
-            except Exception as e:
-                span.end(level="error", status_message=str(e))
-                raise
+            return async_wrapper
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            if not observability.enabled:
-                return func(*args, **kwargs)
-            
             trace = observability.langfuse_client.trace(name=operation_name)
-            span = trace.span(name=f"{operation_name}_execution")
+            span = trace.span(name=span_name)
             
             try:
                 result = func(*args, **kwargs)
@@ -253,11 +384,6 @@ def track_operation(operation_name: str):
                 span.end(level="error", status_message=str(e))
                 raise
         
-        # Return appropriate wrapper based on function type
-        import asyncio
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
+        return sync_wrapper
     
-    return decorator
\ No newline at end of file
+    return decorator
@@ -3,58 +3,72 @@ Configuration for vector database and entity resolution settings.
 """
 
 import os
-from typing import Dict, Any
+import logging
+from dataclasses import dataclass, fields, replace
+from functools import cached_property
+from types import MappingProxyType
+from typing import Dict, Any, Mapping
 
+logger = logging.getLogger(__name__)
 
+
+@dataclass(frozen=True)
 class VectorConfig:
     """Configuration class for vector database settings."""
     
-    def __init__(self):
-        """Initialize vector database configuration."""
-        # Vector database settings
-        self.VECTOR_DB_PERSIST_DIR = os.getenv("VECTOR_DB_PERSIST_DIR", "data/vector_db")
-        self.EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
-        self.CONFIDENCE_THRESHOLD = float(os.getenv("VECTOR_CONFIDENCE_THRESHOLD", "0.5"))  # Lower threshold for better fuzzy matching
-        self.MIN_QUERY_CONFIDENCE = float(os.getenv("MIN_QUERY_CONFIDENCE", "0.3"))      # Lower threshold for query enhancement
-        
-        # spaCy model settings
-        self.SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
-        
-        # Entity indexing settings
-        self.AUTO_INDEX_ON_STARTUP = os.getenv("AUTO_INDEX_ON_STARTUP", "false").lower() == "true"
-        self.INDEX_REFRESH_INTERVAL_HOURS = int(os.getenv("INDEX_REFRESH_INTERVAL_HOURS", "24"))
-        
-        # ChromaDB settings
-        self.CHROMADB_ANONYMIZED_TELEMETRY = False  # Disable to avoid telemetry errors
-        self.CHROMADB_ALLOW_RESET = os.getenv("CHROMADB_ALLOW_RESET", "true").lower() == "true"
-        
-        # Entity resolution settings
-        self.ENABLE_ENTITY_RESOLUTION = os.getenv("ENABLE_ENTITY_RESOLUTION", "true").lower() == "true"
-        self.MAX_SUGGESTIONS_PER_ENTITY = int(os.getenv("MAX_SUGGESTIONS_PER_ENTITY", "3"))
-        self.ENABLE_NO_RESULTS_SUGGESTIONS = os.getenv("ENABLE_NO_RESULTS_SUGGESTIONS", "true").lower() == "true"
-        
-        # Logging settings
-        self.LOG_ENTITY_RESOLUTIONS = os.getenv("LOG_ENTITY_RESOLUTIONS", "true").lower() == "true"
-        self.LOG_VECTOR_SEARCH_DETAILS = os.getenv("LOG_VECTOR_SEARCH_DETAILS", "false").lower() == "true"
+    # Vector database settings
+    VECTOR_DB_PERSIST_DIR: str = "data/vector_db"
+    EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    CONFIDENCE_THRESHOLD: float = 0.5  # Lower threshold for better fuzzy matching
+    MIN_QUERY_CONFIDENCE: float = 0.3  # Lower threshold for query enhancement
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert configuration to dictionary."""
-        return {
-            "vector_db_persist_dir": self.VECTOR_DB_PERSIST_DIR,
-            "embedding_model_name": self.EMBEDDING_MODEL_NAME,
-            "confidence_threshold": self.CONFIDENCE_THRESHOLD,
-            "min_query_confidence": self.MIN_QUERY_CONFIDENCE,
-            "spacy_model": self.SPACY_MODEL,
-            "auto_index_on_startup": self.AUTO_INDEX_ON_STARTUP,
-            "index_refresh_interval_hours": self.INDEX_REFRESH_INTERVAL_HOURS,
-            "chromadb_anonymized_telemetry": self.CHROMADB_ANONYMIZED_TELEMETRY,
-            "chromadb_allow_reset": self.CHROMADB_ALLOW_RESET,
-            "enable_entity_resolution": self.ENABLE_ENTITY_RESOLUTION,
-            "max_suggestions_per_entity": self.MAX_SUGGESTIONS_PER_ENTITY,
-            "enable_no_results_suggestions": self.ENABLE_NO_RESULTS_SUGGESTIONS,
-            "log_entity_resolutions": self.LOG_ENTITY_RESOLUTIONS,
-            "log_vector_search_details": self.LOG_VECTOR_SEARCH_DETAILS
-        }
+    # spaCy model settings
+    SPACY_MODEL: str = "en_core_web_sm"
+    
+    # Entity indexing settings
+    AUTO_INDEX_ON_STARTUP: bool = False
+    INDEX_REFRESH_INTERVAL_HOURS: int = 24
+    
+    # ChromaDB settings
+    CHROMADB_ANONYMIZED_TELEMETRY: bool = False  # Disable to avoid telemetry errors
+    CHROMADB_ALLOW_RESET: bool = True
+    
+    # Entity resolution settings
+    ENABLE_ENTITY_RESOLUTION: bool = True
+    MAX_SUGGESTIONS_PER_ENTITY: int = 3
+    ENABLE_NO_RESULTS_SUGGESTIONS: bool = True
+    
+    # Logging settings
+    LOG_ENTITY_RESOLUTIONS: bool = True
+    LOG_VECTOR_SEARCH_DETAILS: bool = False
+    
+    @classmethod
+    def from_env(cls) -> "VectorConfig":
+        """Build the configuration from environment variables."""
+        env = os.environ
+        return cls(
+            VECTOR_DB_PERSIST_DIR=env.get("VECTOR_DB_PERSIST_DIR", "data/vector_db"),
+            EMBEDDING_MODEL_NAME=env.get("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2"),
+            CONFIDENCE_THRESHOLD=float(env.get("VECTOR_CONFIDENCE_THRESHOLD", "0.5")),
+            MIN_QUERY_CONFIDENCE=float(env.get("MIN_QUERY_CONFIDENCE", "0.3")),
+            SPACY_MODEL=env.get("SPACY_MODEL", "en_core_web_sm"),
+            AUTO_INDEX_ON_STARTUP=env.get("AUTO_INDEX_ON_STARTUP", "false").lower() == "true",
+            INDEX_REFRESH_INTERVAL_HOURS=int(env.get("INDEX_REFRESH_INTERVAL_HOURS", "24")),
+            CHROMADB_ALLOW_RESET=env.get("CHROMADB_ALLOW_RESET", "true").lower() == "true",
+            ENABLE_ENTITY_RESOLUTION=env.get("ENABLE_ENTITY_RESOLUTION", "true").lower() == "true",
+            MAX_SUGGESTIONS_PER_ENTITY=int(env.get("MAX_SUGGESTIONS_PER_ENTITY", "3")),
+            ENABLE_NO_RESULTS_SUGGESTIONS=env.get("ENABLE_NO_RESULTS_SUGGESTIONS", "true").lower() == "true",
+            LOG_ENTITY_RESOLUTIONS=env.get("LOG_ENTITY_RESOLUTIONS", "true").lower() == "true",
+            LOG_VECTOR_SEARCH_DETAILS=env.get("LOG_VECTOR_SEARCH_DETAILS", "false").lower() == "true",
+        )
+    
+    @cached_property
+    def _as_dict(self) -> Mapping[str, Any]:
+        return MappingProxyType({f.name.lower(): getattr(self, f.name) for f in fields(self)})
+    
+    def to_dict(self) -> Mapping[str, Any]:
+        """Convert configuration to a read-only dictionary, built once per configuration."""
+        return self._as_dict
     
     def validate(self) -> Dict[str, Any]:
         """Validate configuration settings."""
@@ -91,7 +105,14 @@ class VectorConfig:
 
 
 # Global configuration instance
-vector_config = VectorConfig()
+vector_config = VectorConfig.from_env()
+
+# Report configuration problems once, at startup
+_validation = vector_config.validate()
+for _error in _validation["errors"]:
+    logger.error(f"Vector config: {_error}")
+for _warning in _validation["warnings"]:
+    logger.warning(f"Vector config: {_warning}")
 
 
 def get_vector_config() -> VectorConfig:
@@ -103,9 +124,8 @@ def update_vector_config(**kwargs) -> None:
     """Update vector configuration with new values."""
     global vector_config
     
-    for key, value in kwargs.items():
-        if hasattr(vector_config, key.upper()):
-            setattr(vector_config, key.upper(), value)
+    changes = {key.upper(): value for key, value in kwargs.items() if hasattr(vector_config, key.upper())}
+    vector_config = replace(vector_config, **changes)
 
 
 # Environment variable documentation
@@ -3,8 +3,13 @@ Persistent Session Manager using SQLite for conversation storage
 """
 
 import uuid
+import sqlite3
+import asyncio
+import threading
+from collections import deque
 from datetime import datetime
 from typing import Dict, List, Optional, Any
+from cachetools import LRUCache, TTLCache
 from app.models.chat import ChatSession, Message, MessageRole
 from app.data_science.tools import ToolContext
 from app.database.models import db_manager
@@ -13,10 +18,24 @@ from app.database.models import db_manager
 class PersistentSessionMemory:
     """Session memory that syncs with SQLite database"""
     
+    RECENT_MESSAGES = 5
+    # Changes made within this many seconds are written together
+    FLUSH_DELAY = 0.1
+    
     def __init__(self, session_id: str):
         self.session_id = session_id
         self.state = {}
         self.history = []
+        # Contents of the last few messages, used as agent context
+        self.recent_contents = deque(maxlen=self.RECENT_MESSAGES)
+        # Unsaved changes and the pending write that will save them
+        self._dirty = False
+        # History list last stored and its length then; entries appended to that
+        # same list since are appended on save
+        self._saved_history: Optional[list] = None
+        self._saved_history_len = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_lock = threading.Lock()
         self._load_from_db()
     
     def _load_from_db(self):
@@ -25,11 +44,21 @@ class PersistentSessionMemory:
         if memory_data:
             self.state = memory_data['context_state']
             self.history = memory_data['history']
+        self._saved_history = self.history
+        self._saved_history_len = len(self.history)
+        self.recent_contents.extend(
+            db_manager.get_recent_message_contents(self.session_id, self.RECENT_MESSAGES)
+        )
     
     def update_state(self, key: str, value: Any):
         """Update state and persist to database"""
         self.state[key] = value
-        self._save_to_db()
+        self._schedule_flush()
+    
+    def bulk_update_state(self, mapping: Dict[str, Any]):
+        """Update several state entries and persist them with one write"""
+        self.state.update(mapping)
+        self._schedule_flush()
     
     def get_state(self, key: str, default=None):
         """Get value from state"""
@@ -43,18 +72,82 @@ class PersistentSessionMemory:
             "response": response,
             "timestamp": datetime.now().isoformat()
         })
-        self._save_to_db()
+        self._schedule_flush()
+    
+    def flush(self):
+        """Write any unsaved changes to the database now"""
+        with self._flush_lock:
+            self.cancel_flush()
+            if not self._dirty:
+                return
+            # Cleared before saving so that changes made during the write are
+            # saved by the next flush
+            self._dirty = False
+            try:
+                self._save_to_db()
+            except Exception:
+                self._dirty = True
+                raise
+    
+    def cancel_flush(self):
+        """Drop the pending write, e.g. because the session is being deleted"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+    
+    def _schedule_flush(self):
+        """Mark memory as changed and write it shortly, coalescing bursts of changes"""
+        self._dirty = True
+        if self._flush_handle is not None:
+            return
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to defer the write on, so save right away
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(self.FLUSH_DELAY, self.flush)
     
     def _save_to_db(self):
         """Save current state to database"""
-        db_manager.save_session_memory(self.session_id, self.state, self.history)
+        if self.history is self._saved_history and len(self.history) >= self._saved_history_len:
+            # History only grows, so only the new entries need writing
+            db_manager.append_session_memory(
+                self.session_id, self.state, self.history[self._saved_history_len:]
+            )
+        else:
+            # The history was shortened or replaced, so rewrite all of it
+            db_manager.save_session_memory(self.session_id, self.state, self.history)
+        self._saved_history = self.history
+        self._saved_history_len = len(self.history)
+
+
+class _SessionMemoryCache(LRUCache):
+    """LRU cache of session memories that saves a memory before evicting it"""
+    
+    def popitem(self):
+        session_id, memory = super().popitem()
+        memory.flush()
+        return session_id, memory
 
 
 class PersistentSessionManager:
     """Session manager with SQLite persistence"""
     
+    MEMORY_CACHE_SIZE = 512
+    # Messages, i.e. 20 user/assistant pairs, included in the conversation context
+    CONTEXT_MESSAGE_LIMIT = 40
+    SESSION_META_CACHE_SIZE = 1024
+    SESSION_META_CACHE_TTL = 60
+    
     def __init__(self):
-        self._memory_cache = {}  # In-memory cache for performance
+        # In-memory cache for performance; least recently used sessions are evicted
+        self._memory_cache = _SessionMemoryCache(maxsize=self.MEMORY_CACHE_SIZE)
+        # Owners of sessions known to exist; a session's owner never changes
+        self._session_meta_cache: TTLCache = TTLCache(
+            maxsize=self.SESSION_META_CACHE_SIZE, ttl=self.SESSION_META_CACHE_TTL
+        )
     
     def create_session(self, title: str = None, session_id: str = None, user_id: str = "anonymous_user") -> ChatSession:
         """Create a new chat session"""
@@ -68,6 +161,7 @@ class PersistentSessionManager:
         
         # Create in database
         db_session = db_manager.create_session(session_id, user_id, title)
+        self._session_meta_cache[session_id] = user_id
         
         # Create ChatSession object
         session = ChatSession(
@@ -82,13 +176,36 @@ class PersistentSessionManager:
     
     def get_session(self, session_id: str) -> Optional[ChatSession]:
         """Get session by ID"""
-        db_session = db_manager.get_session(session_id)
-        if not db_session:
+        db_result = db_manager.get_session_with_messages(session_id)
+        if not db_result:
             return None
         
-        # Get messages from database
-        db_messages = db_manager.get_messages(session_id)
+        self._session_meta_cache[session_id] = db_result['session']['user_id']
+        return self._build_session(db_result['session'], db_result['messages'])
+    
+    def get_or_create_session(self, session_id: Optional[str] = None, user_id: str = "anonymous_user") -> ChatSession:
+        """Get a session by ID, creating it (with that ID, if given) when missing"""
+        if not session_id:
+            return self.create_session(user_id=user_id)
+        
+        now = datetime.now()
+        db_session, created = db_manager.get_or_create_session(
+            session_id, user_id, f"Chat {now.strftime('%Y-%m-%d %H:%M')}"
+        )
+        self._session_meta_cache[session_id] = db_session['user_id']
+        if created:
+            return ChatSession(
+                id=session_id,
+                title=db_session['title'],
+                messages=[],
+                created_at=now,
+                updated_at=now
+            )
         
+        return self._build_session(db_session, db_manager.get_messages(session_id))
+    
+    def _build_session(self, db_session: Dict[str, Any], db_messages: List[Dict[str, Any]]) -> ChatSession:
+        """Build a ChatSession from a session row and its message rows"""
         # Convert to Message objects
         messages = []
         for db_msg in db_messages:
@@ -112,11 +229,21 @@ class PersistentSessionManager:
         
         return session
     
+    def get_session_owner(self, session_id: str) -> Optional[str]:
+        """Get the owning user ID of a session without loading its messages"""
+        owner = self._session_meta_cache.get(session_id)
+        if owner is None:
+            # Missing sessions are not cached, as they may be created later
+            owner = db_manager.get_session_owner(session_id)
+            if owner is not None:
+                self._session_meta_cache[session_id] = owner
+        return owner
+    
     def get_session_memory(self, session_id: str) -> Optional[PersistentSessionMemory]:
         """Get or create session memory"""
         if session_id not in self._memory_cache:
             # Check if session exists
-            if db_manager.get_session(session_id):
+            if self.get_session_owner(session_id) is not None:
                 self._memory_cache[session_id] = PersistentSessionMemory(session_id)
             else:
                 return None
@@ -124,18 +251,23 @@ class PersistentSessionManager:
         return self._memory_cache[session_id]
     
     def add_message(self, session_id: str, content: str, role: MessageRole, 
-                   metadata: Optional[Dict[str, Any]] = None) -> Message:
-        """Add message to session"""
-        # Verify session exists
-        if not db_manager.get_session(session_id):
-            raise ValueError(f"Session {session_id} not found")
+                   metadata: Optional[Dict[str, Any]] = None,
+                   session: Optional[ChatSession] = None) -> Message:
+        """Add message to session
         
+        A missing session is reported by the messages foreign key rather than
+        a separate lookup. When the caller holds the loaded ``session`` the new
+        message is also appended to ``session.messages``.
+        """
         message_id = str(uuid.uuid4())
         
         # Add to database
-        db_message = db_manager.add_message(
-            message_id, session_id, content, role.value, metadata
-        )
+        try:
+            db_message = db_manager.add_message(
+                message_id, session_id, content, role.value, metadata
+            )
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Session {session_id} not found")
         
         # Create Message object
         message = Message(
@@ -146,6 +278,13 @@ class PersistentSessionManager:
             session_id=session_id
         )
         
+        if session is not None:
+            session.messages.append(message)
+        
+        # Keep the recent-message window of a cached memory current
+        if session_id in self._memory_cache:
+            self._memory_cache[session_id].recent_contents.append(content)
+        
         # Update session memory if it's an assistant response
         if role == MessageRole.ASSISTANT:
             memory = self.get_session_memory(session_id)
@@ -154,9 +293,60 @@ class PersistentSessionManager:
         
         return message
     
-    def get_messages(self, session_id: str) -> List[Message]:
-        """Get all messages for a session"""
-        db_messages = db_manager.get_messages(session_id)
+    def add_messages(self, session_id: str, messages: List[Dict[str, Any]],
+                     session: Optional[ChatSession] = None) -> List[Message]:
+        """Add several messages to a session with a single database write
+        
+        Each entry needs ``content`` and ``role`` and may carry ``timestamp``
+        and ``metadata``. As with ``add_message``, a missing session raises
+        ``ValueError`` and a loaded ``session`` receives the new messages.
+        """
+        try:
+            db_messages = db_manager.add_messages(session_id, [
+                {
+                    'id': str(uuid.uuid4()),
+                    'content': message['content'],
+                    'role': message['role'].value,
+                    'timestamp': message.get('timestamp'),
+                    'metadata': message.get('metadata')
+                }
+                for message in messages
+            ])
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Session {session_id} not found")
+        
+        added = [
+            Message(
+                id=db_msg['id'],
+                content=db_msg['content'],
+                role=MessageRole(db_msg['role']),
+                timestamp=db_msg['timestamp'],
+                session_id=session_id
+            )
+            for db_msg in db_messages
+        ]
+        
+        if session is not None:
+            session.messages.extend(added)
+        
+        # Keep the recent-message window of a cached memory current
+        if session_id in self._memory_cache:
+            self._memory_cache[session_id].recent_contents.extend(msg.content for msg in added)
+        
+        # Update session memory with any assistant responses
+        assistant_messages = [msg for msg in added if msg.role == MessageRole.ASSISTANT]
+        if assistant_messages:
+            memory = self.get_session_memory(session_id)
+            if memory:
+                for msg in assistant_messages:
+                    memory.add_to_history("assistant", "", msg.content)
+        
+        return added
+    
+    def get_messages(self, session_id: str, limit: Optional[int] = None,
+                     before_id: Optional[str] = None) -> List[Message]:
+        """Get the messages of a session, optionally only the newest page"""
+        db_messages = db_manager.get_messages(session_id, limit=limit, before_id=before_id)
         
         messages = []
         for db_msg in db_messages:
@@ -173,9 +363,11 @@ class PersistentSessionManager:
     
     def delete_session(self, session_id: str) -> bool:
         """Delete session and all related data"""
-        # Remove from memory cache
-        if session_id in self._memory_cache:
-            del self._memory_cache[session_id]
+        # Remove from memory cache, dropping any write still pending for it
+        memory = self._memory_cache.pop(session_id, None)
+        if memory:
+            memory.cancel_flush()
+        self._session_meta_cache.pop(session_id, None)
         
         # Delete from database
         return db_manager.delete_session(session_id)
@@ -184,9 +376,9 @@ class PersistentSessionManager:
         """Update session title"""
         return db_manager.update_session_title(session_id, title)
     
-    def list_sessions(self) -> List[ChatSession]:
-        """List all sessions"""
-        db_sessions = db_manager.list_sessions()
+    def list_sessions(self, limit: Optional[int] = None, offset: int = 0) -> List[ChatSession]:
+        """List sessions, most recent first"""
+        db_sessions = db_manager.list_sessions(limit=limit, offset=offset)
         
         sessions = []
         for db_session in db_sessions:
@@ -202,22 +394,21 @@ class PersistentSessionManager:
         return sessions
     
     def get_conversation_context(self, session_id: str) -> Dict[str, Any]:
-        """Get comprehensive conversation context"""
-        session = self.get_session(session_id)
+        """Get the conversation context built from the most recent messages"""
         memory = self.get_session_memory(session_id)
-        
-        if not session or not memory:
+        if not memory:
             return {}
         
-        # Build conversation pairs
-        messages = session.messages
+        # Build conversation pairs, matching each reply to the latest unanswered question
+        messages = self.get_messages(session_id, limit=self.CONTEXT_MESSAGE_LIMIT)
         conversation_pairs = []
-        for i in range(0, len(messages), 2):
-            if i < len(messages) - 1:
-                conversation_pairs.append({
-                    "user": messages[i].content if messages[i].role == MessageRole.USER else messages[i+1].content,
-                    "assistant": messages[i+1].content if messages[i+1].role == MessageRole.ASSISTANT else messages[i].content
-                })
+        pending_user = None
+        for msg in messages:
+            if msg.role == MessageRole.USER:
+                pending_user = msg.content
+            elif pending_user is not None:
+                conversation_pairs.append({"user": pending_user, "assistant": msg.content})
+                pending_user = None
         
         return {
             "session_id": session_id,
@@ -225,7 +416,9 @@ class PersistentSessionManager:
             "full_conversation": conversation_pairs,
             "memory_state": memory.state,
             "memory_history": memory.history,
-            "message_count": len(messages),
+            # The full session size; the context itself holds only the newest messages
+            "message_count": db_manager.count_messages(session_id),
+            "context_message_count": len(messages),
             "last_query_result": memory.get_state("query_result"),
             "last_db_output": memory.get_state("db_agent_output"),
             "last_analytics_output": memory.get_state("ds_agent_output")
@@ -233,14 +426,24 @@ class PersistentSessionManager:
     
     def cleanup_old_sessions(self, days_old: int = 30):
         """Clean up old sessions"""
+        # Save pending memory changes before the cache is dropped
+        self.flush_all()
+        
         # Clear memory cache for deleted sessions
         deleted_count = db_manager.cleanup_old_sessions(days_old)
         
         # Clear memory cache (will be rebuilt as needed)
         self._memory_cache.clear()
+        self._session_meta_cache.clear()
         
         return deleted_count
 
+    
+    def flush_all(self):
+        """Write unsaved changes of every cached session memory"""
+        for memory in list(self._memory_cache.values()):
+            memory.flush()
+
 
 # Global persistent session manager instance
 persistent_session_manager = PersistentSessionManager()
\ No newline at end of file
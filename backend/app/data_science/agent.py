@@ -4,13 +4,19 @@ Based on Google ADK samples structure
 """
 
 import os
+import re
+import logging
 import json
+import hashlib
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Union
 import time
 
 import google.generativeai as genai
+import json_repair
+from cachetools import LRUCache, TTLCache
 from dotenv import load_dotenv
 
 from .sub_agents import bqml_agent, ds_agent, db_agent
@@ -21,10 +27,247 @@ from .tools import call_db_agent, call_ds_agent, call_bqml_agent, load_artifacts
 # Import observability
 from app.config.observability import observability
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 
 date_today = date.today()
 
+# The BigQuery schema rarely changes, so it is fetched at most once per TTL
+# instead of on every message
+DB_SETTINGS_CACHE_TTL = 600
+_db_settings_cache: TTLCache = TTLCache(maxsize=1, ttl=DB_SETTINGS_CACHE_TTL)
+
+
+def _schema_digest(schema: str) -> str:
+    """Short digest identifying a schema DDL, used in intent cache keys"""
+    return hashlib.blake2b(schema.encode(), digest_size=8).hexdigest()
+
+
+def _cached_db_settings() -> Dict[str, Any]:
+    """Get the BigQuery database settings, reusing a recent successful fetch"""
+    settings = _db_settings_cache.get("settings")
+    if settings is None:
+        settings = get_database_settings()
+        # Failed fetches are not cached so the next message retries
+        if "error" not in settings:
+            # Hash the DDL once per fetch rather than on every classification
+            settings["schema_digest"] = _schema_digest(settings["bq_ddl_schema"])
+            _db_settings_cache["settings"] = settings
+    return settings
+
+
+def refresh_schema():
+    """Drop the cached database settings so the next message fetches them again"""
+    _db_settings_cache.clear()
+
+
+_json_decoder = json.JSONDecoder()
+
+
+def _parse_first_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Parse the first JSON object in text, or return None while it is incomplete"""
+    start = text.find("{")
+    if start < 0:
+        return None
+    try:
+        return _json_decoder.raw_decode(text, start)[0]
+    except json.JSONDecodeError:
+        return None
+
+
+def _repair_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Leniently parse a malformed JSON object from a finished completion
+    
+    Only used once strict parsing has failed, since repairing is far slower.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    try:
+        repaired = json_repair.loads(text[start:text.rfind("}") + 1 or None])
+    except Exception:
+        return None
+    return repaired if isinstance(repaired, dict) and repaired else None
+
+
+# Items kept from each list of a query result when only its start is printed
+RESULT_EXCERPT_ITEMS = 5
+
+
+def _result_excerpt(result: Any, limit: int) -> str:
+    """Return the first ``limit`` characters of a query result as text
+    
+    Results can hold thousands of rows, so lists are cut short before the
+    result is turned into a string rather than after.
+    """
+    if isinstance(result, dict):
+        result = {
+            key: value[:RESULT_EXCERPT_ITEMS] if isinstance(value, list) else value
+            for key, value in result.items()
+        }
+    elif isinstance(result, list):
+        result = result[:RESULT_EXCERPT_ITEMS]
+    return str(result)[:limit]
+
+
+# Prompt used to route a query, filled in per message with str.format
+CLASSIFICATION_PROMPT_TEMPLATE = """
+You are a routing agent that determines which specialized agent should handle a query.
+
+Current Query: {message}
+{history_text}
+{result_context}
+
+IMPORTANT CONTEXT AWARENESS:
+- If there are previous query results in the conversation, consider if the current query references them
+- Look for pronouns (it, they, these, those) or references to "the data", "results", etc.
+- If the query seems to reference previous data, include that context in your routing decision
+
+ROUTING RULES:
+
+1. DATABASE AGENT - Use when the user wants ACTUAL DATA from the database:
+   - Questions starting with: "Which", "What", "How many", "List", "Show me", "Get", "Find"
+   - Questions about specific people, locations, departments, counts, or records
+   - Questions requiring SQL queries to retrieve data
+   - CRITICAL: "Show me" queries ALWAYS start with database to get actual data first
+   - Examples:
+     * "Which location does [person] work at?" → database
+     * "How many employees work in location X?" → database
+     * "Which locations have the most time entries?" → database
+     * "What is the total hours for department X?" → database
+     * "List all users in the system" → database
+     * "Show me absence patterns" → database
+     * "Show me seasonal patterns in employee hours" → database
+     * "Show me trends in overtime usage" → database
+     * "Show me productivity patterns" → database
+
+2. ANALYTICS AGENT - Use ONLY when the user wants:
+   - Python code examples or scripts WITHOUT real data
+   - Instructions on HOW to analyze data (methodology only)
+   - Statistical analysis methodology (not actual results)
+   - Examples:
+     * "How do I analyze employee turnover?" → analytics
+     * "Write a Python script to calculate correlations" → analytics
+     * "What statistical methods should I use?" → analytics
+     * "Explain how to detect seasonal patterns" → analytics
+
+3. BOTH DATABASE + ANALYTICS - Use when the user wants data AND visualization/analysis:
+   - Questions asking for charts, graphs, visualizations, or analysis of actual data
+   - "Show me" queries that mention: patterns, trends, analysis, charts, graphs
+   - Examples:
+     * "Show me chart of top 5 employees by hours" → database + analytics
+     * "Create a bar chart of absence patterns" → database + analytics
+     * "Show me a graph of overtime by location" → database + analytics
+     * "Visualize time entries by department" → database + analytics
+     * "Show me seasonal patterns in employee hours" → database + analytics
+     * "Analyze productivity trends by location" → database + analytics
+
+4. ML AGENT - Use for machine learning tasks:
+   - Model creation, training, predictions
+   - ML algorithm recommendations
+
+IMPORTANT: 
+- If the query asks for BOTH data AND a chart/graph/visualization, use "database" as primary_agent and ["analytics"] as secondary_agents
+- If the query asks for specific data only, use "database"
+- ANY query starting with "Show me" requires actual data, so use "database" as primary agent
+- For "Show me patterns/trends/analysis", use "database" as primary and ["analytics"] as secondary
+- When in doubt, if the query asks for specific data or information that exists in the database, ALWAYS choose "database"
+- NEVER use "analytics" as primary agent for "Show me" queries - they need real data first
+
+The query "{message}" is asking for: [analyze the query]
+
+Based on the routing rules above, this should go to:
+
+Consider the schema context:
+{schema}
+
+Return a JSON object with:
+{{
+  "primary_agent": "agent_name",
+  "secondary_agents": ["list", "of", "additional", "agents"],
+  "reasoning": "explanation of routing decision",
+  "sub_tasks": ["specific", "tasks", "for", "each", "agent"]
+}}
+"""
+
+# Prompt merging database results with analysis methodology into one answer
+DATA_SYNTHESIS_PROMPT_TEMPLATE = """
+The user asked: {message}
+
+You have both database results and analysis methodology. Provide a unified response that:
+1. Presents the ACTUAL DATA from the database
+2. Adds insights about patterns/trends based on the data
+3. Does NOT include Python code (the user wants results, not code)
+
+Database Results:
+{database_response}
+
+Analysis Methodology:
+{code_only_response}
+
+Provide a direct answer focusing on the actual data and insights, without showing Python code.
+"""
+
+# Prompt merging several agent responses into one answer
+SYNTHESIS_PROMPT_TEMPLATE = """
+Synthesize the following agent responses into a coherent answer for the user:
+
+Original Query: {message}
+
+Agent Responses:
+{responses}
+
+IMPORTANT: Provide a DIRECT and CONCISE unified answer. Focus on the key findings and actionable insights without lengthy explanations.
+"""
+
+
+# Queries whose route is obvious from their wording skip the Gemini
+# classification call; anything else is classified as before
+_DB_QUERY_RE = re.compile(
+    r"^\s*(which|what|how many|how much|list|show me|get|find|top \d+|count|total|average|sum)\b", re.I
+)
+_VIZ_QUERY_RE = re.compile(r"\b(charts?|graphs?|plots?|visuali[sz]e|visuali[sz]ation|patterns?|trends?)\b", re.I)
+_ML_QUERY_RE = re.compile(r"\b(train|predict|prediction|forecast|bqml|machine learning|ml model)\b", re.I)
+# Methodology questions and references to earlier results need the full
+# classification prompt, which sees the conversation
+_AMBIGUOUS_QUERY_RE = re.compile(
+    r"\b(how (do|should|can) i|how to|explain|python|script|code|methods?|methodology"
+    r"|it|its|they|them|these|those|that data|the data|the results?|previous)\b",
+    re.I
+)
+
+
+# Markers of a rendered chart in an agent response
+_CHART_MARKER_RE = re.compile(r"/api/charts/|!\[(?:Bar )?Chart\]")
+
+
+def _prefilter_intent(message: str) -> Optional[Dict[str, Any]]:
+    """Route an unambiguous query by pattern, or return None to classify it with Gemini"""
+    if _AMBIGUOUS_QUERY_RE.search(message):
+        return None
+    
+    wants_data = _DB_QUERY_RE.match(message) is not None
+    wants_chart = _VIZ_QUERY_RE.search(message) is not None
+    if _ML_QUERY_RE.search(message):
+        if wants_data or wants_chart:
+            return None
+        primary_agent, secondary_agents = "bqml", []
+    elif wants_chart:
+        # Charts and pattern analysis need the actual data first
+        primary_agent, secondary_agents = "database", ["analytics"]
+    elif wants_data:
+        primary_agent, secondary_agents = "database", []
+    else:
+        return None
+    
+    return {
+        "primary_agent": primary_agent,
+        "secondary_agents": secondary_agents,
+        "reasoning": "Routed by query pattern",
+        "sub_tasks": [message]
+    }
+
 
 def setup_before_agent_call(tool_context: ToolContext):
     """Setup the agent before processing"""
@@ -37,10 +280,13 @@ def setup_before_agent_call(tool_context: ToolContext):
 
     # Setting up schema in context
     if tool_context.get_state("all_db_settings", {}).get("use_database") == "BigQuery":
-        database_settings = get_database_settings()
-        tool_context.update_state("database_settings", database_settings)
-        schema = database_settings["bq_ddl_schema"]
-        tool_context.update_state("schema", schema)
+        database_settings = _cached_db_settings()
+        # The context already holds these settings from an earlier message
+        if tool_context.get_state("database_settings") is not database_settings:
+            tool_context.update_state("database_settings", database_settings)
+            schema = database_settings["bq_ddl_schema"]
+            tool_context.update_state("schema", schema)
+            tool_context.update_state("schema_digest", database_settings.get("schema_digest"))
 
 
 class DataScienceRootAgent:
@@ -49,6 +295,21 @@ class DataScienceRootAgent:
     Following Google ADK samples structure
     """
     
+    # Tool called for each kind of agent, with the heading of its response as
+    # the primary agent and as a secondary agent
+    AGENT_TOOLS = {
+        "database": ("call_db_agent", "🗄️ **Database Agent Response:**", "🗄️ **Additional Database Analysis:**"),
+        "analytics": ("call_ds_agent", "📊 **Analytics Agent Response:**", "📊 **Additional Analytics:**"),
+        "bqml": ("call_bqml_agent", "🤖 **BQML Agent Response:**", "🤖 **Additional ML Recommendations:**"),
+    }
+    INTENT_CACHE_SIZE = 2048
+    # Shorter replies carry too little to be worth synthesizing with others
+    MIN_SUBSTANTIVE_RESPONSE = 20
+    # Concurrent sub-agent calls across all requests
+    AGENT_POOL_SIZE = 8
+    # Messages processed at once by process_messages
+    BATCH_CONCURRENCY = 8
+    
     def __init__(self):
         self.api_key = os.getenv('GOOGLE_API_KEY') or os.getenv('ADK_API_KEY')
         if not self.api_key:
@@ -72,9 +333,23 @@ class DataScienceRootAgent:
             "load_artifacts": load_artifacts
         }
         
+        # Gemini classifications, keyed by a digest of everything the prompt is built from
+        self._intent_cache = LRUCache(maxsize=self.INTENT_CACHE_SIZE)
+        
+        # Sub-agent calls can block on BigQuery for seconds, so they get their own
+        # threads instead of tying up the default executor used for short jobs
+        self._agent_pool = ThreadPoolExecutor(max_workers=self.AGENT_POOL_SIZE, thread_name_prefix="agent")
+        
+        # The global instruction is static, so it is built once
+        self.refresh_instructions()
+        
     def _get_global_instruction(self) -> str:
         """Get the global instruction for the root agent"""
-        return f"""
+        return self._global_instruction
+    
+    def refresh_instructions(self):
+        """Rebuild the global instruction, e.g. after the root prompt changed"""
+        self._global_instruction = f"""
         You are a Data Science and Data Analytics Multi Agent System.
         Today's date: {date_today}
         
@@ -83,47 +358,99 @@ class DataScienceRootAgent:
     
     async def process_message(self, message: str, context: Optional[Dict[str, Any]] = None) -> str:
         """Process a message through the multi-agent system"""
+        return "".join([chunk async for chunk in self.process_message_stream(message, context)])
+    
+    async def process_messages(
+        self,
+        messages: List[str],
+        context: Optional[Dict[str, Any]] = None,
+        max_concurrency: Optional[int] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> List[Union[str, BaseException]]:
+        """Process several independent messages concurrently
+        
+        Each message gets its own ToolContext seeded from ``context``, so
+        messages never see each other's state. Results are returned in input
+        order; a message that raised is returned as its exception.
+        ``on_progress(done, total)`` is called after each message finishes.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.BATCH_CONCURRENCY)
+        done = 0
+        
+        async def process_one(message: str) -> str:
+            nonlocal done
+            async with semaphore:
+                try:
+                    return await self.process_message(message, dict(context or {}))
+                finally:
+                    done += 1
+                    if on_progress:
+                        on_progress(done, len(messages))
+        
+        return await asyncio.gather(*(process_one(m) for m in messages), return_exceptions=True)
+    
+    async def process_message_stream(self, message: str, context: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Process a message and yield the response as it becomes available
+        
+        Sub-agent responses are yielded whole, while a reply synthesized from
+        several agents is yielded token by token as Gemini streams it.
+        """
         try:
-            print(f"🚀 Processing message: {message[:100]}...")
+            logger.debug("Processing message: %s", message[:100])
             
             # Use provided context or create new one
             if context and isinstance(context, ToolContext):
                 tool_context = context
-                print(f"📥 RECEIVED TOOL CONTEXT with state keys: {list(tool_context.state.keys())}")
+                logger.debug("Received tool context with state keys: %s", list(tool_context.state))
             else:
                 tool_context = ToolContext()
-                print(f"📦 CREATED NEW TOOL CONTEXT")
+                logger.debug("Created new tool context")
                 # Add any provided context if it's a dictionary
                 if context and hasattr(context, 'items'):
                     for key, value in context.items():
                         tool_context.update_state(key, value)
-                    print(f"📥 Added context from dict: {list(context.keys())}")
+                    logger.debug("Added context from dict: %s", list(context))
             
             # Setup before agent call
             setup_before_agent_call(tool_context)
-            print("✅ Setup completed")
             
             # Classify the intent and determine agent routing
             intent = await self._classify_intent(message, tool_context)
-            print(f"🎯 Intent classified: {intent}")
-            print(f"   Primary: {intent.get('primary_agent')}, Secondary: {intent.get('secondary_agents')}")
+            logger.debug("Intent classified: %s", intent)
             
             # Route to appropriate agent(s) based on intent
-            response = await self._route_to_agents(message, intent, tool_context)
-            print(f"📤 Response generated: {len(response) if response else 0} characters")
-            print(f"📤 Final context state: {list(tool_context.state.keys())}")
-            
-            return response
+            response_length = 0
+            async for chunk in self._route_to_agents(message, intent, tool_context):
+                response_length += len(chunk)
+                yield chunk
+            logger.debug("Response generated: %d characters, context state keys: %s",
+                         response_length, list(tool_context.state))
             
         except Exception as e:
-            print(f"❌ Error in DataScienceRootAgent: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return self._get_error_response(str(e))
+            logger.exception("Error in DataScienceRootAgent: %s", e)
+            yield self._get_error_response(str(e))
+    
+    async def _stream_text(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the text of a Gemini completion chunk by chunk as it is generated"""
+        response = await asyncio.to_thread(self.model.generate_content, prompt, stream=True)
+        # The SDK iterator blocks on the network, so each chunk is read in a thread
+        chunks = iter(response)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            if chunk.candidates and chunk.candidates[0].content.parts:
+                yield chunk.candidates[0].content.parts[0].text
     
     async def _classify_intent(self, message: str, tool_context: ToolContext) -> Dict[str, Any]:
         """Classify the user's intent and determine agent routing using AI classification"""
         
+        intent = _prefilter_intent(message)
+        if intent is not None:
+            tool_context.update_state("intent_classification", intent)
+            return intent
+        logger.debug("No routing pattern matched, classifying with Gemini: %s", message[:100])
+        
         # Get conversation history for context
         history = tool_context.history[-5:] if tool_context.history else []
         history_text = ""
@@ -136,106 +463,49 @@ class DataScienceRootAgent:
         last_result = tool_context.get_state("query_result")
         result_context = ""
         if last_result:
-            result_context = f"\n\nLast query result available: {str(last_result)[:200]}..."
+            result_context = f"\n\nLast query result available: {_result_excerpt(last_result, 200)}..."
         
-        classification_prompt = f"""
-You are a routing agent that determines which specialized agent should handle a query.
-
-Current Query: {message}
-{history_text}
-{result_context}
-
-IMPORTANT CONTEXT AWARENESS:
-- If there are previous query results in the conversation, consider if the current query references them
-- Look for pronouns (it, they, these, those) or references to "the data", "results", etc.
-- If the query seems to reference previous data, include that context in your routing decision
-
-ROUTING RULES:
-
-1. DATABASE AGENT - Use when the user wants ACTUAL DATA from the database:
-   - Questions starting with: "Which", "What", "How many", "List", "Show me", "Get", "Find"
-   - Questions about specific people, locations, departments, counts, or records
-   - Questions requiring SQL queries to retrieve data
-   - CRITICAL: "Show me" queries ALWAYS start with database to get actual data first
-   - Examples:
-     * "Which location does [person] work at?" → database
-     * "How many employees work in location X?" → database
-     * "Which locations have the most time entries?" → database
-     * "What is the total hours for department X?" → database
-     * "List all users in the system" → database
-     * "Show me absence patterns" → database
-     * "Show me seasonal patterns in employee hours" → database
-     * "Show me trends in overtime usage" → database
-     * "Show me productivity patterns" → database
-
-2. ANALYTICS AGENT - Use ONLY when the user wants:
-   - Python code examples or scripts WITHOUT real data
-   - Instructions on HOW to analyze data (methodology only)
-   - Statistical analysis methodology (not actual results)
-   - Examples:
-     * "How do I analyze employee turnover?" → analytics
-     * "Write a Python script to calculate correlations" → analytics
-     * "What statistical methods should I use?" → analytics
-     * "Explain how to detect seasonal patterns" → analytics
-
-3. BOTH DATABASE + ANALYTICS - Use when the user wants data AND visualization/analysis:
-   - Questions asking for charts, graphs, visualizations, or analysis of actual data
-   - "Show me" queries that mention: patterns, trends, analysis, charts, graphs
-   - Examples:
-     * "Show me chart of top 5 employees by hours" → database + analytics
-     * "Create a bar chart of absence patterns" → database + analytics
-     * "Show me a graph of overtime by location" → database + analytics
-     * "Visualize time entries by department" → database + analytics
-     * "Show me seasonal patterns in employee hours" → database + analytics
-     * "Analyze productivity trends by location" → database + analytics
-
-4. ML AGENT - Use for machine learning tasks:
-   - Model creation, training, predictions
-   - ML algorithm recommendations
-
-IMPORTANT: 
-- If the query asks for BOTH data AND a chart/graph/visualization, use "database" as primary_agent and ["analytics"] as secondary_agents
-- If the query asks for specific data only, use "database"
-- ANY query starting with "Show me" requires actual data, so use "database" as primary agent
-- For "Show me patterns/trends/analysis", use "database" as primary and ["analytics"] as secondary
-- When in doubt, if the query asks for specific data or information that exists in the database, ALWAYS choose "database"
-- NEVER use "analytics" as primary agent for "Show me" queries - they need real data first
-
-The query "{message}" is asking for: [analyze the query]
-
-Based on the routing rules above, this should go to:
-
-Consider the schema context:
-{tool_context.get_state('schema', 'No schema available')}
-
-Return a JSON object with:
-{{
-  "primary_agent": "agent_name",
-  "secondary_agents": ["list", "of", "additional", "agents"],
-  "reasoning": "explanation of routing decision",
-  "sub_tasks": ["specific", "tasks", "for", "each", "agent"]
-}}
-"""
+        schema = tool_context.get_state('schema', 'No schema available')
+        schema_digest = tool_context.get_state('schema_digest') or _schema_digest(str(schema))
+        
+        # The same query in the same context and schema is classified the same way
+        cache_key = hashlib.blake2b(
+            "|".join((message.lower().strip(), history_text, result_context, schema_digest)).encode(),
+            digest_size=16
+        ).digest()
+        cached_intent = self._intent_cache.get(cache_key)
+        if cached_intent is not None:
+            tool_context.update_state("intent_classification", cached_intent)
+            return cached_intent
+        
+        classification_prompt = CLASSIFICATION_PROMPT_TEMPLATE.format(
+            message=message,
+            history_text=history_text,
+            result_context=result_context,
+            schema=schema
+        )
         
         try:
-            response = await asyncio.to_thread(self.model.generate_content, classification_prompt)
-            
-            # Extract text from response parts
+            # Stop reading the completion as soon as the JSON object is complete
             text = ""
-            if response.candidates and response.candidates[0].content.parts:
-                text = response.candidates[0].content.parts[0].text
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0]
-            
-            intent = json.loads(text.strip())
+            intent = None
+            async for chunk in self._stream_text(classification_prompt):
+                text += chunk
+                if "}" in chunk:
+                    intent = _parse_first_json_object(text)
+                    if intent is not None:
+                        break
+            if intent is None:
+                intent = _repair_json_object(text)
+            if intent is None:
+                raise ValueError(f"No JSON object in classification: {text[:200]}")
             tool_context.update_state("intent_classification", intent)
+            self._intent_cache[cache_key] = intent
             
             return intent
             
         except Exception as e:
-            print(f"Intent classification error: {e}")
+            logger.warning("Intent classification error: %s", e)
             # Default to complex routing
             return {
                 "primary_agent": "analytics",
@@ -244,196 +514,176 @@ Return a JSON object with:
                 "sub_tasks": [message]
             }
     
-    async def _route_to_agents(self, message: str, intent: Dict[str, Any], tool_context: ToolContext) -> str:
-        """Route the message to appropriate agents based on intent"""
+    @staticmethod
+    def _agent_kind(agent: str) -> Optional[str]:
+        """Map an agent name from intent classification to a key of AGENT_TOOLS"""
+        agent_normalized = agent.lower()
+        if "database" in agent_normalized or "bigquery" in agent_normalized or "call_db_agent" in agent_normalized or "db_agent" in agent_normalized:
+            return "database"
+        if "analytics" in agent_normalized or "call_ds_agent" in agent_normalized or "ds_agent" in agent_normalized:
+            return "analytics"
+        if "ml" in agent_normalized:
+            return "bqml"
+        return None
+    
+    def _is_substantive(self, response: Optional[str]) -> bool:
+        """Whether an agent reply has enough content to be worth synthesizing"""
+        return bool(response) and len(response.strip()) > self.MIN_SUBSTANTIVE_RESPONSE
+    
+    async def _call_agent(self, kind: str, message: str, tool_context: ToolContext):
+        """Run a blocking agent tool on the agent pool; returns (response, duration in ms)"""
+        agent_start = time.time()
+        tool_response = await asyncio.get_running_loop().run_in_executor(
+            self._agent_pool, self.tools[self.AGENT_TOOLS[kind][0]], message, tool_context
+        )
+        return tool_response, (time.time() - agent_start) * 1000
+    
+    async def _route_to_agents(self, message: str, intent: Dict[str, Any], tool_context: ToolContext) -> AsyncIterator[str]:
+        """Route the message to appropriate agents based on intent, yielding the reply
+        
+        Sub-agent responses arrive whole; a synthesized reply is streamed as
+        Gemini generates it.
+        """
         
         primary_agent = intent.get("primary_agent", "analytics")
         secondary_agents = intent.get("secondary_agents", [])
         
         responses = []
+        # Successful, non-trivial replies, without their agent headings
+        substantive = []
         agents_called = []
         
         # Get observability trace if available
         trace = tool_context.get_state("observability_trace")
         
-        # Call primary agent
+        # Default to analytics if unknown primary agent. Each agent is called at
+        # most once, even when the classifier names it under several aliases
+        primary_kind = self._agent_kind(primary_agent)
+        calls = [primary_kind or "analytics"]
+        for agent in secondary_agents:
+            kind = self._agent_kind(agent)
+            if kind and kind not in calls:
+                calls.append(kind)
+        
+        # The analytics and BQML agents build on the query_result stored by the
+        # database agent, so database calls finish first and the rest then run
+        # concurrently. Concurrent calls each work on their own copy of the
+        # context, merged back in call order once the stage is done
+        outcomes = [None] * len(calls)
+        database_calls = [i for i, kind in enumerate(calls) if kind == "database"]
+        other_calls = [i for i, kind in enumerate(calls) if kind != "database"]
+        for stage in (database_calls, other_calls):
+            contexts = [tool_context] if len(stage) == 1 else [tool_context.fork() for _ in stage]
+            stage_outcomes = await asyncio.gather(
+                *(self._call_agent(calls[i], message, context) for i, context in zip(stage, contexts)),
+                return_exceptions=True
+            )
+            for i, outcome in zip(stage, stage_outcomes):
+                outcomes[i] = outcome
+            if len(stage) > 1:
+                for context in contexts:
+                    tool_context.merge(context)
+        
+        # Primary agent response
         try:
-            # Normalize agent names for comparison
-            primary_agent_normalized = primary_agent.lower()
+            if isinstance(outcomes[0], BaseException):
+                raise outcomes[0]
+            tool_response, agent_duration = outcomes[0]
             
-            if "database" in primary_agent_normalized or "bigquery" in primary_agent_normalized or "call_db_agent" in primary_agent_normalized or "db_agent" in primary_agent_normalized:
-                agent_start = time.time()
-                tool_response = call_db_agent(message, tool_context)
-                agent_duration = (time.time() - agent_start) * 1000
-                
-                agents_called.append("database")
-                
-                # Track agent call
-                if trace:
-                    observability.track_agent_call(
-                        trace, 
-                        "database", 
-                        message, 
-                        tool_response.get("report", ""),
-                        agent_duration
-                    )
-                
-                if tool_response["status"] == "success":
-                    response = tool_response["report"]
-                else:
-                    response = f"Error: {tool_response['report']}"
-                
-                # For single-agent responses, don't add the agent prefix
-                if len(secondary_agents) == 0:
-                    responses.append(response)
-                else:
-                    responses.append(f"🗄️ **Database Agent Response:**\n{response}")
-                
-            elif "analytics" in primary_agent_normalized or "call_ds_agent" in primary_agent_normalized or "ds_agent" in primary_agent_normalized:
-                agent_start = time.time()
-                tool_response = call_ds_agent(message, tool_context)
-                agent_duration = (time.time() - agent_start) * 1000
-                
-                agents_called.append("analytics")
+            if primary_kind:
+                agents_called.append(primary_kind)
                 
                 # Track agent call
                 if trace:
                     observability.track_agent_call(
                         trace, 
-                        "analytics", 
+                        primary_kind, 
                         message, 
                         tool_response.get("report", ""),
                         agent_duration
                     )
-                
-                if tool_response["status"] == "success":
-                    response = tool_response["report"]
-                else:
-                    response = f"Error: {tool_response['report']}"
-                responses.append(f"📊 **Analytics Agent Response:**\n{response}")
-                
-            elif "ml" in primary_agent_normalized or "bqml" in primary_agent_normalized:
-                agent_start = time.time()
-                tool_response = call_bqml_agent(message, tool_context)
-                agent_duration = (time.time() - agent_start) * 1000
-                
-                agents_called.append("bqml")
-                
-                # Track agent call
-                if trace:
-                    observability.track_agent_call(
-                        trace, 
-                        "bqml", 
-                        message, 
-                        tool_response.get("report", ""),
-                        agent_duration
-                    )
-                
-                if tool_response["status"] == "success":
-                    response = tool_response["report"]
-                else:
-                    response = f"Error: {tool_response['report']}"
-                responses.append(f"🤖 **BQML Agent Response:**\n{response}")
+            
+            if tool_response["status"] == "success":
+                response = tool_response["report"]
+                if self._is_substantive(response):
+                    substantive.append(response)
             else:
-                # Default to analytics if unknown primary agent
-                tool_response = call_ds_agent(message, tool_context)
-                if tool_response["status"] == "success":
-                    response = tool_response["report"]
-                else:
-                    response = f"Error: {tool_response['report']}"
-                responses.append(f"📊 **Analytics Agent Response:**\n{response}")
+                response = f"Error: {tool_response['report']}"
+            
+            # For single-agent database responses, don't add the agent prefix
+            if primary_kind == "database" and len(secondary_agents) == 0:
+                responses.append(response)
+            else:
+                responses.append(f"{self.AGENT_TOOLS[calls[0]][1]}\n{response}")
         except Exception as e:
-            print(f"Error calling primary agent {primary_agent}: {e}")
-            # Fallback to direct response
-            chat = self.model.start_chat(history=[])
-            response = await asyncio.to_thread(chat.send_message, f"{self._get_global_instruction()}\n\nUser Query: {message}")
+            logger.warning("Error calling primary agent %s: %s", primary_agent, e)
+            # Fallback to direct response; a one-shot completion needs no chat session
+            response = await asyncio.to_thread(
+                self.model.generate_content, f"{self._global_instruction}\n\nUser Query: {message}"
+            )
             responses.append(response.text)
+            if self._is_substantive(response.text):
+                substantive.append(response.text)
         
-        # Call secondary agents if needed
-        for agent in secondary_agents:
-            agent_normalized = agent.lower()
-            primary_normalized = primary_agent.lower()
-            
-            if ("database" in agent_normalized or "bigquery" in agent_normalized or "call_db_agent" in agent_normalized or "db_agent" in agent_normalized) and agent_normalized != primary_normalized:
-                tool_response = call_db_agent(message, tool_context)
-                response = tool_response["report"] if tool_response["status"] == "success" else f"Error: {tool_response['report']}"
-                responses.append(f"🗄️ **Additional Database Analysis:**\n{response}")
-                
-            elif ("analytics" in agent_normalized or "call_ds_agent" in agent_normalized or "ds_agent" in agent_normalized) and agent_normalized != primary_normalized:
-                tool_response = call_ds_agent(message, tool_context)
-                response = tool_response["report"] if tool_response["status"] == "success" else f"Error: {tool_response['report']}"
-                responses.append(f"📊 **Additional Analytics:**\n{response}")
-                
-            elif "ml" in agent_normalized and agent_normalized != primary_normalized:
-                tool_response = call_bqml_agent(message, tool_context)
-                response = tool_response["report"] if tool_response["status"] == "success" else f"Error: {tool_response['report']}"
-                responses.append(f"🤖 **Additional ML Recommendations:**\n{response}")
+        # Secondary agent responses
+        for kind, outcome in zip(calls[1:], outcomes[1:]):
+            if isinstance(outcome, BaseException):
+                raise outcome
+            tool_response, _ = outcome
+            response = tool_response["report"] if tool_response["status"] == "success" else f"Error: {tool_response['report']}"
+            responses.append(f"{self.AGENT_TOOLS[kind][2]}\n{response}")
+            if tool_response["status"] == "success" and self._is_substantive(response):
+                substantive.append(response)
         
         # Store agents called in context for metrics
         tool_context.update_state("agents_called", agents_called)
         
+        # Synthesis only adds value when several agents actually answered,
+        # and answered differently
+        if len(responses) > 1 and len(set(substantive)) <= 1:
+            yield substantive[0] if substantive else responses[0]
+            return
+        
         # If complex workflow, synthesize responses
         if len(responses) > 1:
-            # Check for actual charts (images) vs Python code
-            chart_response = None
+            # Check for actual charts (images) vs Python code; chart markers are
+            # matched in one pass and the scan stops at the first hit
+            chart_response = next((r for r in responses if _CHART_MARKER_RE.search(r)), None)
             database_response = None
             code_only_response = None
-            
-            for response in responses:
-                if "/api/charts/" in response or "![Bar Chart]" in response or "![Chart]" in response:
-                    # Actual chart/visualization
-                    chart_response = response
-                elif "🗄️ **Database Agent Response:**" in response:
-                    # Database data response
-                    database_response = response
-                elif "```python" in response and "/api/charts/" not in response:
-                    # Code without actual chart
-                    code_only_response = response
+            if chart_response is None:
+                database_response = next((r for r in responses if self.AGENT_TOOLS["database"][1] in r), None)
+                code_only_response = next(
+                    (r for r in responses if r is not database_response and "```python" in r), None
+                )
             
             # Priority order: actual chart > database data > synthesized response > code only
             if chart_response:
                 # Return actual chart/visualization
-                print(f"Found chart response, returning it directly: {chart_response[:100]}...")
-                return chart_response
+                logger.debug("Found chart response, returning it directly: %s", chart_response[:100])
+                yield chart_response
+                return
             elif database_response and code_only_response:
                 # For "Show me patterns/trends" queries, synthesize database data with methodology
-                synthesis_prompt = f"""
-The user asked: {message}
-
-You have both database results and analysis methodology. Provide a unified response that:
-1. Presents the ACTUAL DATA from the database
-2. Adds insights about patterns/trends based on the data
-3. Does NOT include Python code (the user wants results, not code)
-
-Database Results:
-{database_response}
-
-Analysis Methodology:
-{code_only_response}
-
-Provide a direct answer focusing on the actual data and insights, without showing Python code.
-"""
-                chat = self.model.start_chat(history=[])
-                synthesis = await asyncio.to_thread(chat.send_message, synthesis_prompt)
-                return synthesis.text
+                synthesis_prompt = DATA_SYNTHESIS_PROMPT_TEMPLATE.format(
+                    message=message,
+                    database_response=database_response,
+                    code_only_response=code_only_response
+                )
+                async for chunk in self._stream_text(synthesis_prompt):
+                    yield chunk
+                return
             else:
                 # Normal synthesis for other responses
-                synthesis_prompt = f"""
-Synthesize the following agent responses into a coherent answer for the user:
-
-Original Query: {message}
-
-Agent Responses:
-{chr(10).join(responses)}
-
-IMPORTANT: Provide a DIRECT and CONCISE unified answer. Focus on the key findings and actionable insights without lengthy explanations.
-"""
-                
-                chat = self.model.start_chat(history=[])
-                synthesis = await asyncio.to_thread(chat.send_message, synthesis_prompt)
-                return synthesis.text
+                synthesis_prompt = SYNTHESIS_PROMPT_TEMPLATE.format(
+                    message=message,
+                    responses="\n".join(responses)
+                )
+                async for chunk in self._stream_text(synthesis_prompt):
+                    yield chunk
+                return
         
-        return responses[0] if responses else "No response generated."
+        yield responses[0] if responses else "No response generated."
     
     def _get_error_response(self, error: str) -> str:
         """Generate a helpful error response"""
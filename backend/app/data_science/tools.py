@@ -19,6 +19,10 @@ class ToolContext:
         """Update the context state"""
         self.state[key] = value
     
+    def load_state(self, mapping: Dict[str, Any]):
+        """Update the context state with every entry of a mapping"""
+        self.state.update(mapping)
+    
     def get_state(self, key: str, default=None):
         """Get value from context state"""
         return self.state.get(key, default)
@@ -35,6 +39,20 @@ class ToolContext:
             "response": response,
             "timestamp": asyncio.get_event_loop().time()
         })
+    
+    def fork(self) -> "ToolContext":
+        """Copy this context for an agent call that runs alongside others"""
+        child = ToolContext()
+        child.state = dict(self.state)
+        child.history = list(self.history)
+        return child
+    
+    def merge(self, child: "ToolContext"):
+        """Apply the state changes and new history of a forked context"""
+        for key, value in child.state.items():
+            if key not in self.state or self.state[key] is not value:
+                self.state[key] = value
+        self.history.extend(child.history[len(self.history):])
 
 
 def call_db_agent(question: str, tool_context: ToolContext = None) -> dict:
@@ -3,18 +3,41 @@ SQLite database models for persistent conversation storage
 """
 
 import sqlite3
-import json
+import threading
 import uuid
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
+import orjson
+
+
+def _json_text(value: Any) -> str:
+    """Serialize a value to JSON text for a TEXT column"""
+    # Non-string keys are converted to strings, as the json module does
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
 class DatabaseManager:
     """Manages SQLite database for conversation persistence"""
     
+    # Applied once to every pooled file-database connection
+    CONNECTION_PRAGMAS = (
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA cache_size=-64000',
+        'PRAGMA mmap_size=268435456',
+        'PRAGMA foreign_keys=ON',
+    )
+    
     def __init__(self, db_path: str = "data/conversations.db"):
         self.db_path = db_path
         self._connection = None
+        # File-based databases keep one open connection per thread
+        self._local = threading.local()
+        self._pooled_connections = []
+        self._pool_lock = threading.Lock()
         
         # For file-based databases, ensure directory exists
         if db_path != ":memory:":
@@ -77,12 +100,35 @@ class DatabaseManager:
                     FOREIGN KEY (session_id) REFERENCES chat_sessions (id) ON DELETE CASCADE
                 );
                 
+                -- Agent interaction history, one row per entry (append-only)
+                CREATE TABLE IF NOT EXISTS session_history (
+                    seq INTEGER PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    agent TEXT,
+                    query TEXT,
+                    response TEXT,
+                    timestamp TIMESTAMP,
+                    FOREIGN KEY (session_id) REFERENCES chat_sessions (id) ON DELETE CASCADE
+                );
+                
+                -- Uploaded files table
+                CREATE TABLE IF NOT EXISTS uploaded_files (
+                    file_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    path TEXT NOT NULL,
+                    uploaded_at TIMESTAMP NOT NULL,
+                    content_hash TEXT
+                );
+                
                 -- Indexes for better performance
                 CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages (session_id);
                 CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);
+                CREATE INDEX IF NOT EXISTS idx_messages_session_timestamp ON messages (session_id, timestamp);
                 CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON chat_sessions (updated_at);
                 CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON chat_sessions (user_id);
                 CREATE INDEX IF NOT EXISTS idx_users_email ON users (email);
+                CREATE INDEX IF NOT EXISTS idx_session_history_session_id ON session_history (session_id, seq);
             ''')
             
             # Add user_id column to existing chat_sessions table if it doesn't exist
@@ -97,6 +143,16 @@ class DatabaseManager:
                 else:
                     print(f"⚠️ Database migration issue: {e}")
                 pass
+            
+            # Add content_hash column to uploaded_files tables created before it existed
+            try:
+                conn.execute('ALTER TABLE uploaded_files ADD COLUMN content_hash TEXT')
+                conn.commit()
+            except sqlite3.OperationalError:
+                pass
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_uploaded_files_content_hash ON uploaded_files (content_hash)')
+            
+            self._migrate_history_blobs(conn)
         else:
             # Use temporary connection for file-based database
             with sqlite3.connect(self.db_path) as conn:
@@ -144,12 +200,35 @@ class DatabaseManager:
                         FOREIGN KEY (session_id) REFERENCES chat_sessions (id) ON DELETE CASCADE
                     );
                     
+                    -- Agent interaction history, one row per entry (append-only)
+                    CREATE TABLE IF NOT EXISTS session_history (
+                        seq INTEGER PRIMARY KEY,
+                        session_id TEXT NOT NULL,
+                        agent TEXT,
+                        query TEXT,
+                        response TEXT,
+                        timestamp TIMESTAMP,
+                        FOREIGN KEY (session_id) REFERENCES chat_sessions (id) ON DELETE CASCADE
+                    );
+                    
+                    -- Uploaded files table
+                    CREATE TABLE IF NOT EXISTS uploaded_files (
+                        file_id TEXT PRIMARY KEY,
+                        filename TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        path TEXT NOT NULL,
+                        uploaded_at TIMESTAMP NOT NULL,
+                        content_hash TEXT
+                    );
+                    
                     -- Indexes for better performance
                     CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages (session_id);
                     CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);
+                    CREATE INDEX IF NOT EXISTS idx_messages_session_timestamp ON messages (session_id, timestamp);
                     CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON chat_sessions (updated_at);
                     CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON chat_sessions (user_id);
                     CREATE INDEX IF NOT EXISTS idx_users_email ON users (email);
+                    CREATE INDEX IF NOT EXISTS idx_session_history_session_id ON session_history (session_id, seq);
                 ''')
                 
                 # Add user_id column to existing chat_sessions table if it doesn't exist
@@ -164,6 +243,29 @@ class DatabaseManager:
                     else:
                         print(f"⚠️ Database migration issue: {e}")
                     pass
+                
+                # Add content_hash column to uploaded_files tables created before it existed
+                try:
+                    conn.execute('ALTER TABLE uploaded_files ADD COLUMN content_hash TEXT')
+                    conn.commit()
+                except sqlite3.OperationalError:
+                    pass
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_uploaded_files_content_hash ON uploaded_files (content_hash)')
+                
+                self._migrate_history_blobs(conn)
+    
+    @staticmethod
+    def _migrate_history_blobs(conn: sqlite3.Connection):
+        """Move history stored as JSON in session_memory into session_history rows"""
+        rows = conn.execute('''
+            SELECT session_id, history FROM session_memory WHERE history != '[]'
+        ''').fetchall()
+        for session_id, history in rows:
+            DatabaseManager._insert_history(conn, session_id, orjson.loads(history))
+        if rows:
+            conn.execute("UPDATE session_memory SET history = '[]' WHERE history != '[]'")
+            conn.commit()
+            print(f"✅ Moved history of {len(rows)} sessions to session_history")
     
     def get_connection(self):
         """Get database connection with row factory"""
@@ -171,15 +273,25 @@ class DatabaseManager:
             # Return persistent connection for in-memory database
             return self._connection
         else:
-            # Create new connection for file-based database
-            conn = sqlite3.connect(self.db_path, timeout=30.0)
-            conn.row_factory = sqlite3.Row
-            # Enable WAL mode for better concurrency
-            conn.execute('PRAGMA journal_mode=WAL')
-            # Enable foreign key constraints
-            conn.execute('PRAGMA foreign_keys=ON')
+            # Reuse this thread's connection for file-based database
+            conn = getattr(self._local, 'connection', None)
+            if conn is None:
+                conn = self._open_connection()
+                self._local.connection = conn
+                with self._pool_lock:
+                    self._pooled_connections.append(conn)
             return conn
     
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a file database connection with the pooled PRAGMAs applied"""
+        # Connections are only used by the thread that opened them, but close()
+        # may run elsewhere
+        conn = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
     # User operations
     def create_or_update_user(self, user_id: str, email: str, name: str, 
                              picture: Optional[str] = None, verified_email: bool = False) -> Dict[str, Any]:
@@ -277,6 +389,45 @@ class DatabaseManager:
             'updated_at': now
         }
     
+    def get_or_create_session(self, session_id: str, user_id: str, title: str) -> Tuple[Dict[str, Any], bool]:
+        """Get a session by ID, creating it if missing; returns (session, created)"""
+        now = datetime.now()
+        if self._connection:
+            # For persistent connection, handle transaction manually
+            conn = self._connection
+            created = self._insert_session_if_missing(conn, session_id, user_id, title, now)
+            conn.commit()
+            row = conn.execute('''
+                SELECT * FROM chat_sessions WHERE id = ?
+            ''', (session_id,)).fetchone()
+        else:
+            # For file-based database, use context manager
+            with self.get_connection() as conn:
+                created = self._insert_session_if_missing(conn, session_id, user_id, title, now)
+                row = conn.execute('''
+                    SELECT * FROM chat_sessions WHERE id = ?
+                ''', (session_id,)).fetchone()
+        
+        return dict(row), created
+    
+    @staticmethod
+    def _insert_session_if_missing(conn: sqlite3.Connection, session_id: str, user_id: str,
+                                   title: str, now: datetime) -> bool:
+        """Insert a session and its empty memory unless the ID is taken"""
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO chat_sessions (id, user_id, title, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (session_id, user_id, title, now, now))
+        if cursor.rowcount == 0:
+            return False
+        
+        # Initialize empty memory for the session
+        conn.execute('''
+            INSERT INTO session_memory (session_id, context_state, history, updated_at)
+            VALUES (?, ?, ?, ?)
+        ''', (session_id, '{}', '[]', now))
+        return True
+    
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session by ID"""
         with self.get_connection() as conn:
@@ -288,6 +439,55 @@ class DatabaseManager:
                 return dict(row)
         return None
     
+    def get_session_with_messages(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session and its messages with a single joined query"""
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT s.id, s.user_id, s.title, s.created_at, s.updated_at,
+                       m.id AS message_id, m.content, m.role, m.timestamp, m.metadata
+                FROM chat_sessions s
+                LEFT JOIN messages m ON m.session_id = s.id
+                WHERE s.id = ?
+                ORDER BY m.timestamp, m.rowid
+            ''', (session_id,)).fetchall()
+            
+            if not rows:
+                return None
+            
+            first = rows[0]
+            return {
+                'session': {
+                    'id': first['id'],
+                    'user_id': first['user_id'],
+                    'title': first['title'],
+                    'created_at': first['created_at'],
+                    'updated_at': first['updated_at']
+                },
+                # A session without messages yields one row of NULL message columns
+                'messages': [
+                    {
+                        'id': row['message_id'],
+                        'session_id': session_id,
+                        'content': row['content'],
+                        'role': row['role'],
+                        'timestamp': row['timestamp'],
+                        'metadata': orjson.loads(row['metadata']) if row['metadata'] else None
+                    }
+                    for row in rows if row['message_id'] is not None
+                ]
+            }
+    
+    def get_session_owner(self, session_id: str) -> Optional[str]:
+        """Get the user ID owning a session, or None if it does not exist"""
+        with self.get_connection() as conn:
+            row = conn.execute('''
+                SELECT user_id FROM chat_sessions WHERE id = ? LIMIT 1
+            ''', (session_id,)).fetchone()
+            
+            if row:
+                return row['user_id']
+        return None
+    
     def update_session(self, session_id: str):
         """Update session timestamp"""
         if self._connection:
@@ -304,8 +504,15 @@ class DatabaseManager:
                     UPDATE chat_sessions SET updated_at = ? WHERE id = ?
                 ''', (datetime.now(), session_id))
     
-    def list_sessions(self, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """List sessions ordered by most recent, optionally filtered by user"""
+    def list_sessions(self, user_id: Optional[str] = None, limit: Optional[int] = None,
+                      offset: int = 0) -> List[Dict[str, Any]]:
+        """List sessions ordered by most recent, optionally filtered by user
+        
+        ``limit`` and ``offset`` select one page of the list; without a limit
+        every session from ``offset`` on is returned.
+        """
+        # SQLite treats a negative LIMIT as no limit
+        page = (limit if limit is not None else -1, offset)
         with self.get_connection() as conn:
             # Check if messages table exists
             table_exists = conn.execute('''
@@ -322,7 +529,8 @@ class DatabaseManager:
                         WHERE cs.user_id = ?
                         GROUP BY cs.id
                         ORDER BY cs.updated_at DESC
-                    ''', (user_id,)).fetchall()
+                        LIMIT ? OFFSET ?
+                    ''', (user_id, *page)).fetchall()
                 else:
                     rows = conn.execute('''
                         SELECT cs.*, COUNT(m.id) as message_count
@@ -330,17 +538,20 @@ class DatabaseManager:
                         LEFT JOIN messages m ON cs.id = m.session_id
                         GROUP BY cs.id
                         ORDER BY cs.updated_at DESC
-                    ''').fetchall()
+                        LIMIT ? OFFSET ?
+                    ''', page).fetchall()
             else:
                 # Fallback to simple query without message count
                 if user_id:
                     rows = conn.execute('''
                         SELECT *, 0 as message_count FROM chat_sessions WHERE user_id = ? ORDER BY updated_at DESC
-                    ''', (user_id,)).fetchall()
+                        LIMIT ? OFFSET ?
+                    ''', (user_id, *page)).fetchall()
                 else:
                     rows = conn.execute('''
                         SELECT *, 0 as message_count FROM chat_sessions ORDER BY updated_at DESC
-                    ''').fetchall()
+                        LIMIT ? OFFSET ?
+                    ''', page).fetchall()
             
             return [dict(row) for row in rows]
     
@@ -385,15 +596,19 @@ class DatabaseManager:
                    role: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Add a message to a session"""
         now = datetime.now()
-        metadata_json = json.dumps(metadata) if metadata else None
+        metadata_json = _json_text(metadata) if metadata else None
         
         if self._connection:
             # For persistent connection, handle transaction manually
             conn = self._connection
-            conn.execute('''
-                INSERT INTO messages (id, session_id, content, role, timestamp, metadata)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (message_id, session_id, content, role, now, metadata_json))
+            try:
+                conn.execute('''
+                    INSERT INTO messages (id, session_id, content, role, timestamp, metadata)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (message_id, session_id, content, role, now, metadata_json))
+            except sqlite3.Error:
+                conn.rollback()
+                raise
             conn.commit()
         else:
             # For file-based database, use context manager
@@ -415,44 +630,180 @@ class DatabaseManager:
             'metadata': metadata
         }
     
-    def get_messages(self, session_id: str) -> List[Dict[str, Any]]:
-        """Get all messages for a session"""
+    def add_messages(self, session_id: str, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add several messages to a session in a single transaction
+        
+        Each message dict needs ``id``, ``content`` and ``role`` and may carry
+        ``timestamp`` (defaults to now) and ``metadata``.
+        """
+        now = datetime.now()
+        rows = []
+        added = []
+        for message in messages:
+            timestamp = message.get('timestamp') or now
+            metadata = message.get('metadata')
+            rows.append((
+                message['id'], session_id, message['content'], message['role'],
+                timestamp, _json_text(metadata) if metadata else None
+            ))
+            added.append({
+                'id': message['id'],
+                'session_id': session_id,
+                'content': message['content'],
+                'role': message['role'],
+                'timestamp': timestamp,
+                'metadata': metadata
+            })
+        
+        if self._connection:
+            # For persistent connection, handle transaction manually
+            conn = self._connection
+            try:
+                conn.executemany('''
+                    INSERT INTO messages (id, session_id, content, role, timestamp, metadata)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', rows)
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            conn.execute('''
+                UPDATE chat_sessions SET updated_at = ? WHERE id = ?
+            ''', (now, session_id))
+            conn.commit()
+        else:
+            # For file-based database, use context manager
+            with self.get_connection() as conn:
+                conn.executemany('''
+                    INSERT INTO messages (id, session_id, content, role, timestamp, metadata)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', rows)
+                conn.execute('''
+                    UPDATE chat_sessions SET updated_at = ? WHERE id = ?
+                ''', (now, session_id))
+        
+        return added
+    
+    def get_messages(self, session_id: str, limit: Optional[int] = None,
+                     before_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get the messages of a session, oldest first
+        
+        With ``limit`` only the newest ``limit`` messages are returned, and with
+        ``before_id`` only those sent before that message. Together they page
+        backwards through a long session. Messages are ordered by timestamp and
+        then by insertion, so messages sharing a timestamp are never skipped
+        at a page boundary.
+        """
         with self.get_connection() as conn:
-            rows = conn.execute('''
-                SELECT * FROM messages WHERE session_id = ? ORDER BY timestamp
-            ''', (session_id,)).fetchall()
+            if limit is None and before_id is None:
+                rows = conn.execute('''
+                    SELECT * FROM messages WHERE session_id = ? ORDER BY timestamp, rowid
+                ''', (session_id,)).fetchall()
+            else:
+                # Take the newest page first, then return it in chronological order
+                rows = conn.execute('''
+                    SELECT id, session_id, content, role, timestamp, metadata FROM (
+                        SELECT *, rowid AS seq FROM messages
+                        WHERE session_id = ? AND (
+                            ? IS NULL OR (timestamp, rowid) < (
+                                SELECT timestamp, rowid FROM messages WHERE id = ?
+                            )
+                        )
+                        ORDER BY timestamp DESC, rowid DESC LIMIT ?
+                    ) ORDER BY timestamp, seq
+                ''', (session_id, before_id, before_id, limit if limit is not None else -1)).fetchall()
             
-            messages = []
-            for row in rows:
-                message = dict(row)
-                # Parse metadata JSON
-                if message['metadata']:
-                    message['metadata'] = json.loads(message['metadata'])
-                messages.append(message)
+            return [self._message_from_row(row) for row in rows]
+    
+    def count_messages(self, session_id: str) -> int:
+        """Get the number of messages in a session"""
+        with self.get_connection() as conn:
+            return conn.execute(
+                'SELECT COUNT(*) FROM messages WHERE session_id = ?', (session_id,)
+            ).fetchone()[0]
+    
+    @staticmethod
+    def _message_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a messages row to a dict, parsing its metadata JSON"""
+        message = dict(row)
+        if message['metadata']:
+            message['metadata'] = orjson.loads(message['metadata'])
+        return message
+    
+    def get_recent_message_contents(self, session_id: str, limit: int = 5) -> List[str]:
+        """Get the contents of the most recent messages, oldest first"""
+        with self.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT content FROM (
+                    SELECT content, timestamp, rowid AS seq FROM messages
+                    WHERE session_id = ? ORDER BY timestamp DESC, rowid DESC LIMIT ?
+                ) ORDER BY timestamp, seq
+            ''', (session_id, limit)).fetchall()
             
-            return messages
+            return [row['content'] for row in rows]
     
     # Memory operations
     def save_session_memory(self, session_id: str, context_state: Dict[str, Any], 
                            history: List[Dict[str, Any]]):
-        """Save session memory (context state and history)"""
+        """Save session memory (context state and history), replacing stored history"""
         if self._connection:
             # For persistent connection, handle transaction manually
             conn = self._connection
-            conn.execute('''
-                INSERT OR REPLACE INTO session_memory 
-                (session_id, context_state, history, updated_at)
-                VALUES (?, ?, ?, ?)
-            ''', (session_id, json.dumps(context_state), json.dumps(history), datetime.now()))
+            self._write_session_memory(conn, session_id, context_state, history, replace_history=True)
             conn.commit()
         else:
             # For file-based database, use context manager
             with self.get_connection() as conn:
-                conn.execute('''
-                    INSERT OR REPLACE INTO session_memory 
-                    (session_id, context_state, history, updated_at)
-                    VALUES (?, ?, ?, ?)
-                ''', (session_id, json.dumps(context_state), json.dumps(history), datetime.now()))
+                self._write_session_memory(conn, session_id, context_state, history, replace_history=True)
+    
+    def append_session_memory(self, session_id: str, context_state: Dict[str, Any],
+                              new_history: List[Dict[str, Any]]):
+        """Save the context state and append new history entries"""
+        if self._connection:
+            # For persistent connection, handle transaction manually
+            conn = self._connection
+            self._write_session_memory(conn, session_id, context_state, new_history, replace_history=False)
+            conn.commit()
+        else:
+            # For file-based database, use context manager
+            with self.get_connection() as conn:
+                self._write_session_memory(conn, session_id, context_state, new_history, replace_history=False)
+    
+    @staticmethod
+    def _write_session_memory(conn: sqlite3.Connection, session_id: str, context_state: Dict[str, Any],
+                              history: List[Dict[str, Any]], replace_history: bool):
+        """Upsert the context state and store history entries"""
+        conn.execute('''
+            INSERT INTO session_memory (session_id, context_state, history, updated_at)
+            VALUES (?, ?, '[]', ?)
+            ON CONFLICT (session_id) DO UPDATE SET
+                context_state = excluded.context_state,
+                updated_at = excluded.updated_at
+        ''', (session_id, _json_text(context_state), datetime.now()))
+        if replace_history:
+            conn.execute('''
+                DELETE FROM session_history WHERE session_id = ?
+            ''', (session_id,))
+        DatabaseManager._insert_history(conn, session_id, history)
+    
+    @staticmethod
+    def _insert_history(conn: sqlite3.Connection, session_id: str, history: List[Dict[str, Any]]):
+        """Append history entries to session_history"""
+        conn.executemany('''
+            INSERT INTO session_history (session_id, agent, query, response, timestamp)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (session_id, entry.get('agent'), entry.get('query'), entry.get('response'), entry.get('timestamp'))
+            for entry in history
+        ])
+    
+    @staticmethod
+    def _history_for(conn: sqlite3.Connection, session_id: str) -> List[Dict[str, Any]]:
+        """Load the history entries of a session in insertion order"""
+        rows = conn.execute('''
+            SELECT agent, query, response, timestamp FROM session_history
+            WHERE session_id = ? ORDER BY seq
+        ''', (session_id,)).fetchall()
+        return [dict(row) for row in rows]
     
     def get_session_memory(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session memory"""
@@ -462,14 +813,43 @@ class DatabaseManager:
             ''', (session_id,)).fetchone()
             
             if row:
-                return {
-                    'session_id': row['session_id'],
-                    'context_state': json.loads(row['context_state']),
-                    'history': json.loads(row['history']),
-                    'updated_at': row['updated_at']
-                }
+                return self._memory_from_row(row, self._history_for(conn, session_id))
         return None
     
+    @staticmethod
+    def _memory_from_row(row: sqlite3.Row, history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Convert a session_memory row and its history entries to a dict"""
+        return {
+            'session_id': row['session_id'],
+            'context_state': orjson.loads(row['context_state']),
+            'history': history,
+            'updated_at': row['updated_at']
+        }
+    
+    def get_full_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session with its messages and memory using one connection"""
+        with self.get_connection() as conn:
+            session_row = conn.execute('''
+                SELECT * FROM chat_sessions WHERE id = ?
+            ''', (session_id,)).fetchone()
+            
+            if not session_row:
+                return None
+            
+            message_rows = conn.execute('''
+                SELECT * FROM messages WHERE session_id = ? ORDER BY timestamp, rowid
+            ''', (session_id,)).fetchall()
+            
+            memory_row = conn.execute('''
+                SELECT * FROM session_memory WHERE session_id = ?
+            ''', (session_id,)).fetchone()
+            
+            return {
+                'session': dict(session_row),
+                'messages': [self._message_from_row(row) for row in message_rows],
+                'memory': self._memory_from_row(memory_row, self._history_for(conn, session_id)) if memory_row else None
+            }
+    
     def cleanup_old_sessions(self, days_old: int = 30):
         """Clean up sessions older than specified days"""
         cutoff_date = datetime.now().timestamp() - (days_old * 24 * 60 * 60)
@@ -482,11 +862,94 @@ class DatabaseManager:
             
             return cursor.rowcount
     
+    # Uploaded file operations
+    def add_uploaded_file(self, file_id: str, filename: str, size: int, path: str,
+                          content_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Record an uploaded file"""
+        now = datetime.now()
+        
+        if self._connection:
+            # For persistent connection, handle transaction manually
+            conn = self._connection
+            conn.execute('''
+                INSERT INTO uploaded_files (file_id, filename, size, path, uploaded_at, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (file_id, filename, size, path, now, content_hash))
+            conn.commit()
+        else:
+            # For file-based database, use context manager
+            with self.get_connection() as conn:
+                conn.execute('''
+                    INSERT INTO uploaded_files (file_id, filename, size, path, uploaded_at, content_hash)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (file_id, filename, size, path, now, content_hash))
+        
+        return {
+            'file_id': file_id,
+            'filename': filename,
+            'size': size,
+            'path': path,
+            'uploaded_at': now,
+            'content_hash': content_hash
+        }
+    
+    def get_uploaded_file(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Get an uploaded file record by ID"""
+        with self.get_connection() as conn:
+            row = conn.execute('''
+                SELECT file_id, filename, size, path, uploaded_at, content_hash FROM uploaded_files WHERE file_id = ?
+            ''', (file_id,)).fetchone()
+            
+            if row:
+                return dict(row)
+        return None
+    
+    def get_uploaded_file_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Get the earliest uploaded file record with the given content hash"""
+        with self.get_connection() as conn:
+            row = conn.execute('''
+                SELECT file_id, filename, size, path, uploaded_at, content_hash FROM uploaded_files
+                WHERE content_hash = ? ORDER BY uploaded_at LIMIT 1
+            ''', (content_hash,)).fetchone()
+            
+            if row:
+                return dict(row)
+        return None
+    
+    def delete_uploaded_file(self, file_id: str) -> bool:
+        """Delete an uploaded file record"""
+        if self._connection:
+            # For persistent connection, handle transaction manually
+            conn = self._connection
+            cursor = conn.execute('''
+                DELETE FROM uploaded_files WHERE file_id = ?
+            ''', (file_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+        else:
+            # For file-based database, use context manager
+            with self.get_connection() as conn:
+                cursor = conn.execute('''
+                    DELETE FROM uploaded_files WHERE file_id = ?
+                ''', (file_id,))
+                return cursor.rowcount > 0
+    
     def close(self):
         """Close the database connection if it exists"""
         if self._connection:
             self._connection.close()
             self._connection = None
+        
+        with self._pool_lock:
+            pooled, self._pooled_connections = self._pooled_connections, []
+            self._local = threading.local()
+        for conn in pooled:
+            try:
+                # Let SQLite refresh query planner statistics before closing
+                conn.execute('PRAGMA optimize')
+            except sqlite3.Error:
+                pass
+            conn.close()
 
 
 # Global database manager instance
@@ -3,7 +3,12 @@ Authentication Middleware
 Handles JWT token validation and user context injection
 """
 
+import hashlib
+import threading
+import time
 from typing import Optional, Callable
+
+from cachetools import TTLCache
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import JSONResponse
@@ -13,6 +18,40 @@ from app.config.auth_config import get_auth_config, GoogleUser
 
 security = HTTPBearer(auto_error=False)
 
+# Recently verified tokens, keyed by a truncated SHA-256 of the signing key
+# version and the token. Entries hold (user, expires_at) and live at most
+# TOKEN_CACHE_TTL seconds; expired tokens are never served from the cache.
+TOKEN_CACHE_TTL = 10
+_token_cache: TTLCache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
+_token_cache_lock = threading.Lock()
+
+
+def verify_token(token: str) -> Optional[GoogleUser]:
+    """Verify a JWT, reusing the result of a recent successful verification"""
+    auth_config = get_auth_config()
+    # Rotating the signing key changes the version and so invalidates old entries
+    key_version = getattr(auth_config, 'jwt_key_version', '')
+    key = hashlib.sha256(f"{key_version}:{token}".encode()).digest()[:16]
+    
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached and cached[1] > time.time():
+        return cached[0]
+    
+    if hasattr(auth_config, 'verify_jwt_token_with_expiry'):
+        user, expires_at = auth_config.verify_jwt_token_with_expiry(token)
+    else:
+        user, expires_at = auth_config.verify_jwt_token(token), None
+    
+    # Only successful verifications are cached
+    if user:
+        if expires_at is None:
+            expires_at = float("inf")
+        with _token_cache_lock:
+            _token_cache[key] = (user, expires_at)
+    
+    return user
+
 
 class AuthMiddleware:
     """Middleware to handle authentication for protected routes"""
@@ -83,17 +122,17 @@ class AuthMiddleware:
         auth_header = request.headers.get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
             token = auth_header.split(" ")[1]
-            return self.auth_config.verify_jwt_token(token)
+            return verify_token(token)
         
         # Try to get token from cookie
         token = request.cookies.get("access_token")
         if token:
-            return self.auth_config.verify_jwt_token(token)
+            return verify_token(token)
         
         # Try to get token from query parameter (for development)
         token = request.query_params.get("token")
         if token:
-            return self.auth_config.verify_jwt_token(token)
+            return verify_token(token)
         
         return None
 
@@ -0,0 +1,25 @@
+"""
+Upload Size Middleware
+Rejects uploads whose declared size exceeds the upload limit before the body is read
+"""
+
+from typing import Callable
+from fastapi import Request
+from fastapi.responses import ORJSONResponse
+
+from app.api.upload import MAX_FILE_SIZE
+
+
+# Allowance for multipart framing around the file (boundaries, part headers)
+MULTIPART_OVERHEAD = 64 * 1024
+UPLOAD_PATHS = {"/api/upload"}
+
+
+async def upload_limit_middleware(request: Request, call_next: Callable):
+    """Answer 413 for uploads whose Content-Length is over the limit"""
+    if request.method == "POST" and request.url.path in UPLOAD_PATHS:
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+            return ORJSONResponse({"detail": "File too large"}, status_code=413)
+
+    return await call_next(request)
@@ -26,6 +26,8 @@ class ChartExecutor:
         """Initialize chart executor."""
         self.chart_dir = os.path.join(os.getcwd(), "uploads", "charts")
         os.makedirs(self.chart_dir, exist_ok=True)
+        # Charts known to exist, filename -> absolute path
+        self._known_charts: Dict[str, str] = {}
         
     def execute_chart_code(self, python_code: str) -> Dict[str, Any]:
         """
@@ -90,6 +92,8 @@ class ChartExecutor:
             
             # Check if file was created
             if os.path.exists(chart_path):
+                self._known_charts[chart_filename] = chart_path
+                
                 # Convert to base64 for embedding in response
                 with open(chart_path, 'rb') as img_file:
                     img_data = base64.b64encode(img_file.read()).decode('utf-8')
@@ -117,10 +121,20 @@ class ChartExecutor:
     
     def get_chart_path(self, chart_filename: str) -> Optional[str]:
         """Get the full path to a chart file."""
+        chart_path = self._known_charts.get(chart_filename)
+        if chart_path:
+            return chart_path
+        
+        # Fall back to the filesystem for charts generated by another process
         chart_path = os.path.join(self.chart_dir, chart_filename)
         if os.path.exists(chart_path):
+            self._known_charts[chart_filename] = chart_path
             return chart_path
         return None
+    
+    def forget_chart(self, chart_filename: str) -> None:
+        """Drop a chart from the known-chart index (e.g. after it was removed)."""
+        self._known_charts.pop(chart_filename, None)
 
 
 # Global chart executor instance
@@ -30,9 +30,9 @@ class EntityResolver:
     
     def __init__(self):
         """Initialize the entity resolver."""
-        from app.config.vector_config import vector_config
+        from app.config.vector_config import get_vector_config
         
-        self.config = vector_config
+        self.config = get_vector_config()
         self.vector_service = vector_search_service
         self.min_query_confidence = self.config.MIN_QUERY_CONFIDENCE
         
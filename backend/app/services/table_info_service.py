@@ -15,8 +15,11 @@
 """Table Information Service for getting BigQuery table schemas and generating query suggestions."""
 
 import os
+import re
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound, GoogleCloudError
 import google.generativeai as genai
@@ -27,6 +30,12 @@ from app.data_science.sub_agents.bigquery.tools import bq_manager, get_database_
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Table metadata changes slowly; entries older than this are refreshed in the background
+TABLE_INFO_TTL = 300  # seconds
+
+# Body of a fenced code block in a Gemini response, e.g. ```json ... ```
+_CODE_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.S)
+
 
 class TableInfoService:
     """Service for managing table information and query suggestions."""
@@ -41,9 +50,53 @@ class TableInfoService:
         else:
             self.model = None
             logger.warning("No API key configured for query suggestions")
+        
+        # Cached results keyed by name, as (fetched_at, value). Stale entries keep
+        # being served while a background task refreshes them.
+        self._cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._refresh_tasks: Dict[str, asyncio.Task] = {}
+    
+    def _get_cached(self, key: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Return a cached value and whether it is still fresh."""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None, False
+        fetched_at, value = entry
+        return value, time.monotonic() - fetched_at < TABLE_INFO_TTL
+    
+    def _store(self, key: str, value: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache a successful result and return it."""
+        if "error" not in value:
+            self._cache[key] = (time.monotonic(), value)
+        return value
+    
+    def _refresh_in_background(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> bool:
+        """Schedule a refresh of a cached value; False if no event loop is running."""
+        if key in self._refresh_tasks:
+            return True
+        try:
+            task = asyncio.get_running_loop().create_task(refresh())
+        except RuntimeError:
+            return False
+        self._refresh_tasks[key] = task
+        task.add_done_callback(lambda _: self._refresh_tasks.pop(key, None))
+        return True
+    
+    def invalidate_cache(self):
+        """Drop cached table information so the next request reloads it."""
+        self._cache.clear()
     
     def get_comprehensive_table_info(self) -> Dict[str, Any]:
         """Get comprehensive information about all tables in the dataset."""
+        table_info, fresh = self._get_cached("table_info")
+        if table_info is not None and (
+            fresh or self._refresh_in_background("table_info", lambda: asyncio.to_thread(self._load_table_info))
+        ):
+            return table_info
+        return self._load_table_info()
+    
+    def _load_table_info(self) -> Dict[str, Any]:
+        """Load table information from BigQuery and cache it."""
         try:
             db_settings = get_database_settings()
             tables = self.bq_manager.get_tables()
@@ -54,7 +107,7 @@ class TableInfoService:
                 if table_info and "error" not in table_info:
                     table_details[table_name] = table_info
             
-            return {
+            return self._store("table_info", {
                 "database_info": {
                     "type": "BigQuery",
                     "project_id": db_settings.get("project_id"),
@@ -65,7 +118,7 @@ class TableInfoService:
                 "tables": table_details,
                 "schema_ddl": db_settings.get("bq_ddl_schema", ""),
                 "available_datasets": db_settings.get("available_datasets", [])
-            }
+            })
             
         except Exception as e:
             logger.error(f"Error getting comprehensive table info: {e}")
@@ -167,11 +220,9 @@ Only return the JSON array, no additional text."""
                 import json
                 try:
                     # Remove any markdown formatting
-                    if "```json" in response_text:
-                        json_start = response_text.find("```json") + 7
-                        json_end = response_text.find("```", json_start)
-                        if json_end != -1:
-                            response_text = response_text[json_start:json_end]
+                    fenced = _CODE_FENCE_RE.search(response_text)
+                    if fenced:
+                        response_text = fenced.group(1)
                     
                     suggestions = json.loads(response_text)
                     if isinstance(suggestions, list):
@@ -255,6 +306,15 @@ Only return the JSON array, no additional text."""
     
     async def get_table_info_with_suggestions(self) -> Dict[str, Any]:
         """Get comprehensive table information with query suggestions."""
+        result, fresh = self._get_cached("suggestions")
+        if result is not None and (
+            fresh or self._refresh_in_background("suggestions", self._load_table_info_with_suggestions)
+        ):
+            return result
+        return await self._load_table_info_with_suggestions()
+    
+    async def _load_table_info_with_suggestions(self) -> Dict[str, Any]:
+        """Build table information with freshly generated suggestions and cache it."""
         try:
             # Get table information
             table_info = self.get_comprehensive_table_info()
@@ -272,7 +332,7 @@ Only return the JSON array, no additional text."""
                 "suggestion_categories": list(set(suggestion.get("category", "General") for suggestion in query_suggestions))
             }
             
-            return result
+            return self._store("suggestions", result)
             
         except Exception as e:
             logger.error(f"Error getting table info with suggestions: {e}")
@@ -33,9 +33,9 @@ class VectorSearchService:
     
     def __init__(self, persist_directory: str = None):
         """Initialize the vector search service."""
-        from app.config.vector_config import vector_config
+        from app.config.vector_config import get_vector_config
         
-        self.config = vector_config
+        self.config = get_vector_config()
         self.persist_directory = persist_directory or self.config.VECTOR_DB_PERSIST_DIR
         self.embedding_model_name = self.config.EMBEDDING_MODEL_NAME
         self.confidence_threshold = self.config.CONFIDENCE_THRESHOLD
@@ -1,4 +1,10 @@
+import logging
+import os
+from contextlib import asynccontextmanager
+
+import httpx
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.chat import router as chat_router
 from app.api.upload import router as upload_router
@@ -11,42 +17,10 @@ from app.api.database import router as database_router
 
 # Import authentication middleware
 from app.middleware.auth_middleware import auth_middleware
+from app.middleware.upload_limit_middleware import upload_limit_middleware
 
-app = FastAPI(
-    title="TMS AI Chatbot Assistant",
-    description="Backend API for the ADK-powered data science chatbot",
-    version="1.0.0"
-)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Add authentication middleware
-app.middleware("http")(auth_middleware)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 
-app.include_router(auth_router)  # Auth routes don't need /api prefix
-app.include_router(chat_router, prefix="/api")
-app.include_router(upload_router, prefix="/api")
-# WebSocket router removed
-app.include_router(charts_router, prefix="/api")
-app.include_router(table_info_router, prefix="/api")
-app.include_router(suggested_questions_router, prefix="/api")
-app.include_router(database_router, prefix="/api")
-
-@app.get("/")
-async def root():
-    return {"message": "ADK Data Science Chatbot API is running"}
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
-
-@app.on_event("startup")
 async def startup_event():
     """Initialize database and other resources on startup"""
     from app.database.models import db_manager
@@ -75,16 +49,87 @@ async def startup_event():
         print(f"❌ Database initialization failed: {e}")
         raise
 
-@app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup resources on shutdown"""
     try:
         # Flush observability data
         from app.config.observability import observability
-        observability.flush()
+        await observability.shutdown()
         print("✅ Observability data flushed")
     except Exception as e:
         print(f"⚠️ Error flushing observability data: {e}")
+    
+    try:
+        # Save session memory changes still waiting to be written
+        from app.core.persistent_session_manager import persistent_session_manager
+        persistent_session_manager.flush_all()
+        print("✅ Session memory saved")
+    except Exception as e:
+        print(f"⚠️ Error saving session memory: {e}")
+    
+    try:
+        # Close pooled database connections
+        from app.database.models import db_manager
+        db_manager.close()
+        print("✅ Database connections closed")
+    except Exception as e:
+        print(f"⚠️ Error closing database connections: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan: startup, shared resources and shutdown"""
+    await startup_event()
+    
+    # Shared HTTP/2 client for outbound calls (Google OAuth endpoints)
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=5.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=32)
+    )
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+        await shutdown_event()
+
+app = FastAPI(
+    title="TMS AI Chatbot Assistant",
+    description="Backend API for the ADK-powered data science chatbot",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Add authentication middleware
+app.middleware("http")(auth_middleware)
+
+# Reject oversized uploads before authentication or body parsing
+app.middleware("http")(upload_limit_middleware)
+
+app.include_router(auth_router)  # Auth routes don't need /api prefix
+app.include_router(chat_router, prefix="/api")
+app.include_router(upload_router, prefix="/api")
+# WebSocket router removed
+app.include_router(charts_router, prefix="/api")
+app.include_router(table_info_router, prefix="/api")
+app.include_router(suggested_questions_router, prefix="/api")
+app.include_router(database_router, prefix="/api")
+
+@app.get("/")
+async def root():
+    return {"message": "ADK Data Science Chatbot API is running"}
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
 
 def serve():
     """Entry point for poetry script"""
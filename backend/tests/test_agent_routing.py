@@ -72,6 +72,77 @@ class TestAgentRouting:
         except ImportError as e:
             pytest.skip(f"DatabaseAgent not available: {e}")
 
+    
+    def test_prefilter_routes_obvious_queries(self):
+        """Test that clear-cut queries are routed without a Gemini call"""
+        try:
+            from app.data_science.agent import _prefilter_intent
+        except ImportError as e:
+            pytest.skip(f"Root agent not available: {e}")
+        
+        assert _prefilter_intent("How many employees work in location X?")["primary_agent"] == "database"
+        assert _prefilter_intent("Total hours by department last month")["primary_agent"] == "database"
+        
+        chart = _prefilter_intent("Show me chart of top 5 employees by hours")
+        assert chart["primary_agent"] == "database"
+        assert chart["secondary_agents"] == ["analytics"]
+        
+        assert _prefilter_intent("Train a model to predict overtime")["primary_agent"] == "bqml"
+        
+        # Methodology questions and follow-ups are left to the classifier
+        assert _prefilter_intent("What statistical methods should I use?") is None
+        assert _prefilter_intent("Show me those results as a chart") is None
+    
+    @pytest.mark.asyncio
+    async def test_malformed_classification_is_repaired(self):
+        """Test that a slightly malformed routing reply is repaired instead of discarded"""
+        try:
+            from app.data_science.agent import root_agent
+        except ImportError as e:
+            pytest.skip(f"Root agent not available: {e}")
+        
+        async def fake_stream_text(prompt):
+            # Trailing comma and an unquoted key, as Gemini sometimes produces
+            yield '```json\n{"primary_agent": "database", "secondary_agents": ["analytics",],'
+            yield ' reasoning: "needs data and a chart"}\n```'
+        
+        context = ToolContext()
+        context.update_state("schema", "CREATE TABLE repair_test (hours INT)")
+        with patch.object(root_agent, "_stream_text", side_effect=fake_stream_text):
+            intent = await root_agent._classify_intent("What statistical methods should I use?", context)
+        
+        assert intent["primary_agent"] == "database"
+        assert intent["secondary_agents"] == ["analytics"]
+    
+    @pytest.mark.asyncio
+    async def test_process_messages_keeps_order_and_isolates_context(self):
+        """Test batch processing returns results in order with a context per message"""
+        try:
+            from app.data_science.agent import root_agent
+        except ImportError as e:
+            pytest.skip(f"Root agent not available: {e}")
+        
+        seen_contexts = []
+        
+        async def fake_process_message(message, context=None):
+            seen_contexts.append(context)
+            if message == "bad":
+                raise ValueError("boom")
+            return message.upper()
+        
+        progress = []
+        with patch.object(root_agent, "process_message", side_effect=fake_process_message):
+            results = await root_agent.process_messages(
+                ["a", "bad", "c"], {"user_id": "u1"}, max_concurrency=2,
+                on_progress=lambda done, total: progress.append((done, total))
+            )
+        
+        assert results[0] == "A" and results[2] == "C"
+        assert isinstance(results[1], ValueError)
+        assert progress[-1] == (3, 3)
+        assert all(ctx == {"user_id": "u1"} for ctx in seen_contexts)
+        assert len({id(ctx) for ctx in seen_contexts}) == 3
+
 
 class TestToolContext:
     """Test ToolContext functionality"""
@@ -103,6 +174,28 @@ class TestToolContext:
         assert "key2" in keys
         assert len(keys) >= 2
     
+    def test_forked_contexts_merge_back(self):
+        """Test that changes made on forked contexts are merged into the parent"""
+        context = ToolContext()
+        context.update_state("query_result", [{"hours": 8}])
+        context.history.append({"agent": "database", "query": "q", "response": "r", "timestamp": 0})
+        
+        analytics, bqml = context.fork(), context.fork()
+        analytics.update_state("ds_agent_output", "chart")
+        analytics.history.append({"agent": "analytics", "query": "q", "response": "chart", "timestamp": 1})
+        bqml.update_state("bqml_agent_output", "model")
+        
+        # Forks do not see each other's changes until merged
+        assert "ds_agent_output" not in context.state
+        assert "ds_agent_output" not in bqml.state
+        
+        context.merge(analytics)
+        context.merge(bqml)
+        assert context.get_state("ds_agent_output") == "chart"
+        assert context.get_state("bqml_agent_output") == "model"
+        assert context.get_state("query_result") == [{"hours": 8}]
+        assert [entry["agent"] for entry in context.history] == ["database", "analytics"]
+    
     def test_context_callback_preservation(self):
         """Test that callback context is preserved"""
         context = ToolContext()
@@ -119,4 +119,104 @@ def test_mock_chat_api():
             assert health_response.json()["status"] == "healthy"
             
     except ImportError:
-        pytest.skip("FastAPI not available for mock testing")
\ No newline at end of file
+        pytest.skip("FastAPI not available for mock testing")
+
+def test_database_stats_keep_recent_sessions_as_objects():
+    """Test that recent sessions are returned as objects unless columns are requested"""
+    try:
+        from app.api.database import _shape_stats
+    except ImportError:
+        pytest.skip("Database API not available")
+    
+    stats = {
+        "session_count": 1,
+        "recent_sessions": {"columns": ["id", "title"], "rows": [("s1", "First")]}
+    }
+    
+    assert _shape_stats(stats, columnar=False)["recent_sessions"] == [{"id": "s1", "title": "First"}]
+    assert _shape_stats(stats, columnar=True)["recent_sessions"] == stats["recent_sessions"]
+    # The cached stats are left in columnar form
+    assert stats["recent_sessions"]["rows"] == [("s1", "First")]
+
+
+def test_question_categories_served_with_etag():
+    """Test that the question categories endpoint returns its payload with an ETag"""
+    try:
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from app.api.suggested_questions import router
+    except ImportError:
+        pytest.skip("Suggested questions API not available")
+    
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    client = TestClient(app)
+    
+    response = client.get("/api/suggested-questions/categories")
+    assert response.status_code == 200
+    assert response.headers["etag"]
+    assert isinstance(response.json(), dict)
+    
+    cached = client.get("/api/suggested-questions/categories", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+
+def test_chat_send_refuses_another_users_session(test_session_manager, test_db_manager, monkeypatch):
+    """Test that a user cannot post into a session owned by someone else"""
+    try:
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        import app.api.chat as chat_api
+    except ImportError:
+        pytest.skip("Chat API not available")
+    
+    test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+    test_db_manager.create_or_update_user("user-2", "user2@example.com", "User Two")
+    session = test_session_manager.create_session(title="Private", user_id="user-1")
+    
+    monkeypatch.setattr(chat_api, "session_manager", test_session_manager)
+    monkeypatch.setattr(chat_api, "get_current_user", lambda request: None)
+    monkeypatch.setattr(chat_api, "get_user_id", lambda request: "user-2")
+    agent_call = AsyncMock(return_value="should not run")
+    monkeypatch.setattr(chat_api.data_science_agent, "process_message", agent_call)
+    
+    app = FastAPI()
+    app.include_router(chat_api.router, prefix="/api")
+    client = TestClient(app)
+    
+    body = {"message": "What did they ask?", "session_id": session.id}
+    assert client.post("/api/chat/send", json=body).status_code == 403
+    assert client.post("/api/chat/send/stream", json=body).status_code == 403
+    agent_call.assert_not_called()
+    assert test_session_manager.get_messages(session.id) == []
+
+
+def test_chat_export_checks_session_owner(test_session_manager, test_db_manager, monkeypatch):
+    """Test that only the owner can export a session and unknown sessions are 404"""
+    try:
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from app.models.chat import MessageRole
+        import app.api.upload as upload_api
+    except ImportError:
+        pytest.skip("Upload API not available")
+    
+    test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+    session = test_session_manager.create_session(title="Private", user_id="user-1")
+    test_session_manager.add_message(session.id, "Headcount?", MessageRole.USER)
+    
+    current_user = {"id": "user-2"}
+    monkeypatch.setattr(upload_api, "session_manager", test_session_manager)
+    monkeypatch.setattr(upload_api, "get_user_id", lambda request: current_user["id"])
+    
+    app = FastAPI()
+    app.include_router(upload_api.router, prefix="/api")
+    client = TestClient(app)
+    
+    assert client.get("/api/export/missing-session").status_code == 404
+    assert client.get(f"/api/export/{session.id}").status_code == 403
+    
+    current_user["id"] = "user-1"
+    response = client.get(f"/api/export/{session.id}?format=txt")
+    assert response.status_code == 200
+    assert "Headcount?" in response.text
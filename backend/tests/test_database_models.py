@@ -3,6 +3,7 @@ Tests for database models and persistence
 """
 
 import pytest
+import sqlite3
 from datetime import datetime, timedelta
 import json
 
@@ -76,6 +77,190 @@ class TestDatabaseManager:
         assert messages[1]['role'] == "assistant"
         assert messages[1]['metadata']['confidence'] == 0.95
     
+    def test_add_messages_batch(self, test_db_manager):
+        """Test adding several messages in one call"""
+        session_id = "test-session-batch"
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        test_db_manager.create_session(session_id, "user-1", "Batch Session")
+        
+        sent_at = datetime.now() - timedelta(seconds=5)
+        added = test_db_manager.add_messages(session_id, [
+            {"id": "msg-1", "content": "Question", "role": "user", "timestamp": sent_at},
+            {"id": "msg-2", "content": "Answer", "role": "assistant", "metadata": {"agent": "database"}}
+        ])
+        
+        assert [m['id'] for m in added] == ["msg-1", "msg-2"]
+        assert added[0]['timestamp'] == sent_at
+        
+        messages = test_db_manager.get_messages(session_id)
+        assert [m['content'] for m in messages] == ["Question", "Answer"]
+        assert messages[1]['metadata'] == {"agent": "database"}
+    
+    def test_get_messages_paged(self, test_db_manager):
+        """Test paging backwards through the messages of a session"""
+        session_id = "test-session-paged"
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        test_db_manager.create_session(session_id, "user-1", "Paged Session")
+        
+        start = datetime.now() - timedelta(minutes=5)
+        added = test_db_manager.add_messages(session_id, [
+            {"id": f"msg-{i}", "content": f"Message {i}", "role": "user", "timestamp": start + timedelta(seconds=i)}
+            for i in range(5)
+        ])
+        
+        newest = test_db_manager.get_messages(session_id, limit=2)
+        assert [m['id'] for m in newest] == ["msg-3", "msg-4"]
+        
+        older = test_db_manager.get_messages(session_id, limit=2, before_id="msg-3")
+        assert [m['id'] for m in older] == ["msg-1", "msg-2"]
+        
+        assert len(test_db_manager.get_messages(session_id)) == 5
+        assert test_db_manager.count_messages(session_id) == 5
+    
+    def test_get_messages_paged_across_equal_timestamps(self, test_db_manager):
+        """Test that messages sharing a timestamp are not lost between pages"""
+        session_id = "test-session-ties"
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        test_db_manager.create_session(session_id, "user-1", "Tied Session")
+        
+        sent_at = datetime.now() - timedelta(minutes=5)
+        test_db_manager.add_messages(session_id, [
+            {"id": f"msg-{i}", "content": f"Message {i}", "role": "user", "timestamp": sent_at}
+            for i in range(4)
+        ])
+        
+        newest = test_db_manager.get_messages(session_id, limit=2)
+        older = test_db_manager.get_messages(session_id, limit=2, before_id=newest[0]['id'])
+        assert [m['id'] for m in older + newest] == ["msg-0", "msg-1", "msg-2", "msg-3"]
+        
+        # Every loader returns tied messages in the same, insertion order
+        expected = ["msg-0", "msg-1", "msg-2", "msg-3"]
+        assert [m['id'] for m in test_db_manager.get_session_with_messages(session_id)['messages']] == expected
+        assert [m['id'] for m in test_db_manager.get_full_session(session_id)['messages']] == expected
+    
+    def test_list_sessions_paged(self, test_db_manager):
+        """Test listing sessions one page at a time"""
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        for i in range(3):
+            test_db_manager.create_session(f"session-{i}", "user-1", f"Session {i}")
+        
+        first_page = test_db_manager.list_sessions(user_id="user-1", limit=2)
+        second_page = test_db_manager.list_sessions(user_id="user-1", limit=2, offset=2)
+        assert len(first_page) == 2
+        assert len(second_page) == 1
+        assert {s['id'] for s in first_page + second_page} == {"session-0", "session-1", "session-2"}
+    
+    def test_uploaded_file_records(self, test_db_manager):
+        """Test recording, looking up and deleting uploaded files"""
+        test_db_manager.add_uploaded_file("file-1", "data.csv", 128, "uploads/file-1_data.csv")
+        
+        uploaded = test_db_manager.get_uploaded_file("file-1")
+        assert uploaded['filename'] == "data.csv"
+        assert uploaded['size'] == 128
+        assert uploaded['path'] == "uploads/file-1_data.csv"
+        
+        assert test_db_manager.get_uploaded_file_by_hash("abc123") is None
+        test_db_manager.add_uploaded_file("file-2", "copy.csv", 128, "uploads/file-2_copy.csv", content_hash="abc123")
+        assert test_db_manager.get_uploaded_file_by_hash("abc123")['file_id'] == "file-2"
+        
+        assert test_db_manager.delete_uploaded_file("file-1") is True
+        assert test_db_manager.get_uploaded_file("file-1") is None
+    
+    def test_get_full_session(self, test_db_manager):
+        """Test loading a session with its messages and memory in one call"""
+        session_id = "test-session-full"
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        test_db_manager.create_session(session_id, "user-1", "Full Session")
+        test_db_manager.add_message("msg-1", session_id, "Hello", "user", metadata={"source": "test"})
+        test_db_manager.save_session_memory(session_id, {"last_query": "Hello"}, [])
+        
+        full = test_db_manager.get_full_session(session_id)
+        assert full['session']['title'] == "Full Session"
+        assert [m['id'] for m in full['messages']] == ["msg-1"]
+        assert full['messages'][0]['metadata'] == {"source": "test"}
+        assert full['memory']['context_state'] == {"last_query": "Hello"}
+        
+        assert test_db_manager.get_full_session("nonexistent-id") is None
+    
+    def test_get_session_with_messages(self, test_db_manager):
+        """Test loading a session and its messages with one joined query"""
+        session_id = "test-session-joined"
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        test_db_manager.create_session(session_id, "user-1", "Joined Session")
+        
+        loaded = test_db_manager.get_session_with_messages(session_id)
+        assert loaded['session']['title'] == "Joined Session"
+        assert loaded['messages'] == []
+        
+        test_db_manager.add_message("msg-1", session_id, "Hello", "user", metadata={"source": "test"})
+        test_db_manager.add_message("msg-2", session_id, "Hi", "assistant")
+        
+        loaded = test_db_manager.get_session_with_messages(session_id)
+        assert [m['id'] for m in loaded['messages']] == ["msg-1", "msg-2"]
+        assert loaded['messages'][0]['metadata'] == {"source": "test"}
+        assert loaded['messages'][1]['metadata'] is None
+        
+        assert test_db_manager.get_session_with_messages("nonexistent-id") is None
+    
+    def test_add_message_to_missing_session(self, test_db_manager):
+        """Test that the messages foreign key rejects an unknown session"""
+        with pytest.raises(sqlite3.IntegrityError):
+            test_db_manager.add_message("msg-1", "nonexistent-id", "Hello", "user")
+        
+        assert test_db_manager.get_messages("nonexistent-id") == []
+    
+    def test_get_or_create_session(self, test_db_manager):
+        """Test that get_or_create_session creates a session only once"""
+        session_id = "test-session-get-or-create"
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        
+        session, created = test_db_manager.get_or_create_session(session_id, "user-1", "First Title")
+        assert created
+        assert session['title'] == "First Title"
+        assert test_db_manager.get_session_memory(session_id) is not None
+        
+        session, created = test_db_manager.get_or_create_session(session_id, "user-1", "Second Title")
+        assert not created
+        assert session['title'] == "First Title"
+    
+    def test_append_session_memory(self, test_db_manager):
+        """Test that appended history entries follow the stored ones"""
+        session_id = "test-session-append"
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        test_db_manager.create_session(session_id, "user-1", "Append Session")
+        
+        test_db_manager.save_session_memory(session_id, {"step": 1}, [
+            {"agent": "database", "query": "Q1", "response": "A1", "timestamp": "2024-01-01T10:00:00"}
+        ])
+        test_db_manager.append_session_memory(session_id, {"step": 2}, [
+            {"agent": "analytics", "query": "Q2", "response": "A2", "timestamp": "2024-01-01T10:01:00"}
+        ])
+        
+        memory = test_db_manager.get_session_memory(session_id)
+        assert memory['context_state'] == {"step": 2}
+        assert [entry['query'] for entry in memory['history']] == ["Q1", "Q2"]
+        
+        # A full save replaces the stored history
+        test_db_manager.save_session_memory(session_id, {"step": 3}, [])
+        assert test_db_manager.get_session_memory(session_id)['history'] == []
+    
+    def test_history_blobs_migrate_to_rows(self, test_db_manager):
+        """Test that history stored as a JSON blob is moved into session_history"""
+        session_id = "test-session-legacy"
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        test_db_manager.create_session(session_id, "user-1", "Legacy Session")
+        
+        legacy = [{"agent": "database", "query": "Q1", "response": "A1", "timestamp": "2024-01-01T10:00:00"}]
+        with test_db_manager.get_connection() as conn:
+            conn.execute(
+                "UPDATE session_memory SET history = ? WHERE session_id = ?",
+                (json.dumps(legacy), session_id)
+            )
+        
+        test_db_manager.init_database()
+        
+        assert test_db_manager.get_session_memory(session_id)['history'] == legacy
+    
     def test_save_and_get_session_memory(self, test_db_manager):
         """Test saving and retrieving session memory"""
         session_id = "test-session-3"
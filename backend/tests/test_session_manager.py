@@ -2,6 +2,7 @@
 Tests for persistent session manager
 """
 
+import sqlite3
 import pytest
 from datetime import datetime
 from app.models.chat import MessageRole
@@ -80,6 +81,76 @@ class TestPersistentSessionManager:
         assert len(new_memory.history) == 1
         assert new_memory.history[0]["agent"] == "database"
     
+    def test_bulk_update_state_persists(self, test_session_manager, test_db_manager):
+        """Test updating several memory state keys at once"""
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        session = test_session_manager.create_session(title="Bulk State Test", user_id="user-1")
+        
+        memory = test_session_manager.get_session_memory(session.id)
+        memory.bulk_update_state({"last_query": "Headcount?", "total_tokens": 120})
+        
+        new_memory = test_session_manager.__class__().get_session_memory(session.id)
+        assert new_memory.get_state("last_query") == "Headcount?"
+        assert new_memory.get_state("total_tokens") == 120
+    
+    @pytest.mark.asyncio
+    async def test_memory_changes_coalesce_into_one_write(self, test_session_manager, test_db_manager, monkeypatch):
+        """Test that memory changes made together are saved in a single write"""
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        session = test_session_manager.create_session(title="Coalesce Test", user_id="user-1")
+        memory = test_session_manager.get_session_memory(session.id)
+        
+        writes = []
+        for name in ("save_session_memory", "append_session_memory"):
+            write = getattr(test_db_manager, name)
+            monkeypatch.setattr(
+                test_db_manager, name,
+                lambda *args, name=name, write=write: (writes.append(name), write(*args))
+            )
+        
+        memory.update_state("last_query", "Headcount?")
+        memory.add_to_history("database", "Headcount?", "42")
+        assert writes == []
+        
+        test_session_manager.flush_all()
+        assert writes == ["append_session_memory"]
+        saved = test_db_manager.get_session_memory(session.id)
+        assert saved['context_state']['last_query'] == "Headcount?"
+        assert len(saved['history']) == 1
+    
+    def test_failed_flush_keeps_changes_pending(self, test_session_manager, test_db_manager, monkeypatch):
+        """Test that changes survive a failed write and are saved by the next flush"""
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        session = test_session_manager.create_session(title="Retry Test", user_id="user-1")
+        memory = test_session_manager.get_session_memory(session.id)
+        
+        def failing_write(*args):
+            raise sqlite3.OperationalError("database is locked")
+        
+        with monkeypatch.context() as patched:
+            patched.setattr(test_db_manager, "append_session_memory", failing_write)
+            with pytest.raises(sqlite3.OperationalError):
+                memory.update_state("last_query", "Headcount?")
+        
+        memory.flush()
+        assert test_db_manager.get_session_memory(session.id)['context_state'] == {"last_query": "Headcount?"}
+    
+    def test_replaced_history_is_rewritten(self, test_session_manager, test_db_manager):
+        """Test that a history replaced by another list is saved in full"""
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        session = test_session_manager.create_session(title="Replace Test", user_id="user-1")
+        memory = test_session_manager.get_session_memory(session.id)
+        memory.add_to_history("database", "First?", "1")
+        
+        memory.history = [
+            {"agent": "analytics", "query": "Other?", "response": "2", "timestamp": "t"},
+            {"agent": "analytics", "query": "Another?", "response": "3", "timestamp": "t"},
+        ]
+        memory.update_state("last_query", "Another?")
+        
+        saved = test_db_manager.get_session_memory(session.id)
+        assert [entry["query"] for entry in saved['history']] == ["Other?", "Another?"]
+    
     def test_add_message_with_metadata(self, test_session_manager):
         """Test adding messages with metadata"""
         session = test_session_manager.create_session(title="Metadata Test")
@@ -103,6 +174,24 @@ class TestPersistentSessionManager:
         assert len(retrieved) == 1
         # Note: metadata is stored in DB but not on Message model
     
+    def test_add_messages_updates_loaded_session(self, test_session_manager, test_db_manager):
+        """Test batch-adding messages to an already loaded session"""
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        session = test_session_manager.create_session(title="Batch Test", user_id="user-1")
+        
+        user_message, ai_message = test_session_manager.add_messages(session.id, [
+            {"content": "How many employees?", "role": MessageRole.USER},
+            {"content": "There are 42 employees.", "role": MessageRole.ASSISTANT}
+        ], session=session)
+        
+        assert user_message.role == MessageRole.USER
+        assert ai_message.role == MessageRole.ASSISTANT
+        assert [m.id for m in session.messages] == [user_message.id, ai_message.id]
+        
+        # Assistant replies are recorded in the session memory history
+        memory = test_session_manager.get_session_memory(session.id)
+        assert memory.history[-1]["response"] == "There are 42 employees."
+    
     def test_memory_cache(self, test_session_manager):
         """Test that memory cache works correctly"""
         session = test_session_manager.create_session(title="Cache Test")
@@ -117,6 +206,21 @@ class TestPersistentSessionManager:
         assert memory2.get_state("test") == "value1"
         assert memory1 is memory2  # Same object reference
     
+    @pytest.mark.asyncio
+    async def test_memory_cache_evicts_least_recently_used(self, test_session_manager, test_db_manager, monkeypatch):
+        """Test that an evicted session memory is saved before it is dropped"""
+        monkeypatch.setattr(test_session_manager, "_memory_cache", type(test_session_manager._memory_cache)(maxsize=1))
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        first = test_session_manager.create_session(title="First", user_id="user-1")
+        second = test_session_manager.create_session(title="Second", user_id="user-1")
+        
+        # The change is still pending when the next session pushes it out
+        test_session_manager.get_session_memory(first.id).update_state("test", "value")
+        test_session_manager.get_session_memory(second.id)
+        
+        assert first.id not in test_session_manager._memory_cache
+        assert test_db_manager.get_session_memory(first.id)['context_state'] == {"test": "value"}
+    
     def test_delete_session_clears_cache(self, test_session_manager):
         """Test that deleting a session clears its cache"""
         session = test_session_manager.create_session(title="Delete Test")
@@ -137,6 +241,23 @@ class TestPersistentSessionManager:
         assert test_session_manager.get_session(session_id) is None
         assert test_session_manager.get_session_memory(session_id) is None
     
+    def test_session_owner_is_cached(self, test_session_manager, test_db_manager, monkeypatch):
+        """Test that owner lookups of a known session skip the database"""
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        session = test_session_manager.create_session(title="Owner Test", user_id="user-1")
+        
+        lookups = []
+        monkeypatch.setattr(test_db_manager, "get_session_owner", lambda session_id: lookups.append(session_id))
+        
+        assert test_session_manager.get_session_owner(session.id) == "user-1"
+        assert test_session_manager.get_session_memory(session.id) is not None
+        assert lookups == []
+        
+        # Deleted sessions are forgotten
+        test_session_manager.delete_session(session.id)
+        assert test_session_manager.get_session_owner(session.id) is None
+        assert lookups == [session.id]
+    
     def test_list_sessions_without_messages(self, test_session_manager):
         """Test that listing sessions doesn't load all messages"""
         # Create sessions with messages
@@ -191,6 +312,34 @@ class TestPersistentSessionManager:
         assert context["memory_state"]["last_query"] == "Who else works there?"
         assert context["last_query_result"]["employees"] == ["John", "Jane", "Bob"]
     
+    def test_conversation_pairs_skip_unanswered_questions(self, test_session_manager, test_db_manager):
+        """Test that each reply is paired with the question right before it"""
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        session = test_session_manager.create_session(title="Pairing Test", user_id="user-1")
+        for content, role in [
+            ("Leading reply", MessageRole.ASSISTANT),
+            ("First question", MessageRole.USER),
+            ("Second question", MessageRole.USER),
+            ("Answer", MessageRole.ASSISTANT),
+        ]:
+            test_session_manager.add_message(session.id, content, role)
+        
+        context = test_session_manager.get_conversation_context(session.id)
+        assert context["full_conversation"] == [{"user": "Second question", "assistant": "Answer"}]
+    
+    def test_conversation_context_reports_full_message_count(self, test_session_manager, test_db_manager, monkeypatch):
+        """Test that a capped context still reports how many messages the session has"""
+        monkeypatch.setattr(test_session_manager, "CONTEXT_MESSAGE_LIMIT", 2)
+        test_db_manager.create_or_update_user("user-1", "user1@example.com", "User One")
+        session = test_session_manager.create_session(title="Count Test", user_id="user-1")
+        for i in range(3):
+            test_session_manager.add_message(session.id, f"Question {i}", MessageRole.USER)
+        
+        context = test_session_manager.get_conversation_context(session.id)
+        assert context["message_count"] == 3
+        assert context["context_message_count"] == 2
+        assert context["message_history"] == ["Question 1", "Question 2"]
+    
     def test_cleanup_old_sessions(self, test_session_manager):
         """Test cleanup functionality"""
         # Create sessions